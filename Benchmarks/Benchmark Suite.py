@@ -0,0 +1,159 @@
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCHMARK_DIR, os.pardir)
+sys.path.append(os.path.join(REPO_DIR, 'Specie Retreival Function'))
+sys.path.append(os.path.join(REPO_DIR, 'Estimators'))
+
+from species_engine import compute_species, duration_arrays, encode_log, species_tasks
+from species_estimators import AbundanceProfile, ace_simplified, ace_traditional, calculate_s_obs_q1_q2, \
+    jackknife_order_1, jackknife_order_2, jackknife_resampling
+from synthetic_log import synthetic_log
+
+DATASET_DIR = os.path.join(REPO_DIR, 'Dataset', 'Dataset Feture Calculations')
+
+
+def jackknife_no_sampling(profile):
+    S_obs, Q1, Q2 = calculate_s_obs_q1_q2(profile)
+    return round(jackknife_order_1(S_obs, Q1)), round(jackknife_order_2(S_obs, Q1, Q2))
+
+
+# the shared species_estimators helpers the Estimators scripts call, not the scripts themselves
+ESTIMATOR_BENCHMARKS = {
+    'species_estimators.jackknife_order_1 + jackknife_order_2': jackknife_no_sampling,
+    'species_estimators.jackknife_resampling': jackknife_resampling,
+    'species_estimators.ace_simplified (rare_threshold=5)': lambda profile: ace_simplified(profile, rare_threshold=5),
+    'species_estimators.ace_simplified (rare_threshold=10)': lambda profile: ace_simplified(profile, rare_threshold=10),
+    'species_estimators.ace_traditional': ace_traditional,
+}
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def timed(function, *args, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - started) / repeat
+
+
+def peak_traced_bytes(function, *args) -> int:
+    """Peak Python/numpy allocation of one untimed call, so it is this task's and not the process's."""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_species_table(csv_path, repeat):
+    df = pd.read_csv(csv_path)
+    counts = df[df.columns[-1]].to_numpy()
+    baseline = current_rss_bytes()
+    records = []
+
+    def record(task, function, *args):
+        seconds = timed(function, *args, repeat=repeat)
+        records.append({'suite': 'species_estimators', 'dataset': os.path.basename(os.path.dirname(csv_path)),
+                        'input': os.path.basename(csv_path), 'task': task, 'rows': len(counts), 'seconds': seconds,
+                        'rows_per_second': len(counts) / seconds if seconds else None,
+                        'peak_traced_bytes': peak_traced_bytes(function, *args)})
+
+    record('species_estimators.AbundanceProfile.from_counts', AbundanceProfile.from_counts, counts)
+    profile = AbundanceProfile.from_counts(counts)
+    for name, estimator in ESTIMATOR_BENCHMARKS.items():
+        record(name, estimator, profile)
+    return records, baseline, peak_rss_bytes()
+
+
+def benchmark_species_extraction(num_cases, repeat):
+    log_frame = synthetic_log(num_cases)
+    baseline = current_rss_bytes()
+    records = []
+
+    def record(task, function, *args):
+        seconds = timed(function, *args, repeat=repeat)
+        records.append({'suite': 'species', 'dataset': 'synthetic', 'input': f'{num_cases} cases',
+                        'task': task, 'rows': len(log_frame), 'seconds': seconds,
+                        'rows_per_second': len(log_frame) / seconds if seconds else None,
+                        'peak_traced_bytes': peak_traced_bytes(function, *args)})
+
+    record('encode_log', encode_log, log_frame)
+    log = encode_log(log_frame)
+    record('duration_arrays', duration_arrays, log)
+    durations = duration_arrays(log)
+    for name, (kind, params) in species_tasks().items():
+        record(name, compute_species, log, kind, params, durations)
+    return records, baseline, peak_rss_bytes()
+
+
+def run_isolated(task, *args):
+    """Runs one benchmark in a fresh interpreter so its peak RSS is not inflated by earlier runs.
+
+    Returns the task records and one process record; the RSS figures cover every task of the run.
+    """
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        records, baseline, peak = pool.apply(task, args)
+    process = {key: records[0][key] for key in ('suite', 'dataset', 'input')} if records else {}
+    process.update(tasks=len(records), baseline_rss_bytes=baseline, peak_rss_bytes=peak)
+    return records, process
+
+
+def run_benchmarks(synthetic_sizes=(1_000, 10_000, 100_000), repeat=3, output_file='benchmark_report.json'):
+    records = []
+    processes = []
+    csv_paths = sorted(glob.glob(os.path.join(DATASET_DIR, '*', '*.csv')))
+    runs = [(benchmark_species_table, csv_path) for csv_path in csv_paths]
+    runs += [(benchmark_species_extraction, num_cases) for num_cases in synthetic_sizes]
+    for task, argument in runs:
+        task_records, process = run_isolated(task, argument, repeat)
+        records += task_records
+        processes.append(process)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'results': records,
+        'processes': processes,
+    }
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    report = run_benchmarks()
+    print(pd.DataFrame(report['results'])[['suite', 'dataset', 'input', 'task', 'rows', 'seconds',
+                                           'peak_traced_bytes']])
+    print(pd.DataFrame(report['processes']))
+    print("Report saved to: benchmark_report.json")
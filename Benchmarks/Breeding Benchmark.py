@@ -0,0 +1,98 @@
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic_log import synthetic_log
+
+BOOTSTRAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Bootstrap Sampling')
+sys.path.append(BOOTSTRAP_DIR)
+
+from breeding import KPointCrossover, PrefixJoin, SinglePointCrossover
+
+CASE_ID_KEY = 'case:concept:name'
+
+
+def load_script(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(BOOTSTRAP_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# the per-pair pandas crossover the vectorized operators replaced, kept as the baseline
+def legacy_crossover_subtrace(trace1, trace2, subtrace_length):
+    trace1_events = trace1.to_dict('records')
+    trace2_events = trace2.to_dict('records')
+    len1 = min(len(trace1_events), subtrace_length)
+    len2 = min(len(trace2_events), subtrace_length)
+    return pd.DataFrame(trace1_events[:len1] + trace2_events[:len2])
+
+
+def legacy_breeding(event_log, num_pairs, subtrace_length, seed=0):
+    random.seed(seed)
+    traces = event_log.groupby(CASE_ID_KEY)
+    case_ids = random.sample(list(traces.groups.keys()), k=2 * num_pairs)
+    sampled_log = pd.DataFrame(columns=event_log.columns)
+    for j in range(0, len(case_ids) - 1, 2):
+        new_trace = legacy_crossover_subtrace(traces.get_group(case_ids[j]), traces.get_group(case_ids[j + 1]),
+                                              subtrace_length)
+        sampled_log = pd.concat([sampled_log, new_trace])
+    return sampled_log
+
+
+def measure(function, bred_traces, repeat=3):
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - started)
+    best = min(seconds)
+    return {'bred_traces': bred_traces, 'seconds': best, 'bred_traces_per_second': bred_traces / best}
+
+
+def run_benchmark(num_cases=20_000, generations=5, subtrace_length=10, legacy_pairs=500, output_file=None):
+    bootstrap = load_script('Bootstrap sampling.py', 'bootstrap_sampling')
+    operators = {
+        'prefix': PrefixJoin(subtrace_length),
+        'single_point': SinglePointCrossover(),
+        'k_point (k=2)': KPointCrossover(2),
+        'k_point (k=4)': KPointCrossover(4),
+    }
+    event_log = synthetic_log(num_cases, lifecycle=False)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_csv = os.path.join(work_dir, 'log.csv')
+        event_log.to_csv(input_csv, index=False)
+        event_log = pd.read_csv(input_csv)
+        results.append({'operator': 'prefix', 'implementation': 'legacy', 'events': len(event_log),
+                        **measure(lambda: legacy_breeding(event_log, legacy_pairs, subtrace_length), legacy_pairs,
+                                  repeat=1)})
+        print(results[-1])
+        for name, operator in operators.items():
+            sampler = bootstrap.LSMbrBootstrapGeneralization(input_csv, work_dir, num_cases, 1, generations,
+                                                             subtrace_length, 1.0, seed=0, write_samples=False,
+                                                             operator=operator)
+            bred_traces = generations * (num_cases // 2)
+            rng = np.random.default_rng(0)
+            results.append({'operator': name, 'implementation': 'numpy', 'events': len(event_log),
+                            **measure(lambda: sampler.breed_sample(rng), bred_traces)})
+            print(results[-1])
+            results.append({'operator': name, 'implementation': 'numpy + sample frame', 'events': len(event_log),
+                            **measure(lambda: sampler.take_sample(sampler.event_log, sampler.breed_sample(rng)),
+                                      bred_traces)})
+            print(results[-1])
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark(output_file='breeding_benchmark.json')
@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from pandas import DataFrame
+
+from synthetic_log import synthetic_log
+
+SRF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Specie Retreival Function')
+sys.path.append(SRF_DIR)
+
+CASE_ID_KEY = 'case:concept:name'
+ACTIVITY_ID_KEY = 'concept:name'
+TIMESTAMP = 'time:timestamp'
+LIFECYCLE = 'lifecycle:transition'
+DURATION_KEY = 'time:duration'
+FROM_KEY = 'time:from'
+UNTIL_KEY = 'time:until'
+
+
+def load_script(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SRF_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# the pandas implementations the NumPy converters in SRF(TB,EB).py replaced, kept as the baseline
+def legacy_log_to_durationlog(log: DataFrame) -> DataFrame:
+    if LIFECYCLE in log.columns:
+        log = log[log[LIFECYCLE].str.lower() == "complete"]
+    sort_columns = [CASE_ID_KEY, TIMESTAMP]
+    df: DataFrame = log.sort_values(sort_columns).reset_index()
+
+    aux_case = 'aux_case_' + str(time.time())
+    aux_timestamp = 'aux_time_' + str(time.time())
+
+    df[aux_case] = df[CASE_ID_KEY].shift(1)
+    df[aux_timestamp] = df[TIMESTAMP].shift(1)
+
+    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP])
+    df[aux_timestamp] = pd.to_datetime(df[aux_timestamp])
+
+    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], format='ISO8601')
+    df[aux_timestamp] = pd.to_datetime(df[aux_timestamp], format='ISO8601')
+
+    at_border = ~(df[aux_case] == df[CASE_ID_KEY])
+    df.loc[~at_border, FROM_KEY] = df[~at_border][aux_timestamp]
+    df.loc[at_border, FROM_KEY] = df[at_border][TIMESTAMP]
+    df[UNTIL_KEY] = df[TIMESTAMP]
+
+    df = df.drop([aux_case, aux_timestamp], axis=1)
+
+    df[FROM_KEY] = pd.to_datetime(df[FROM_KEY])
+    df[UNTIL_KEY] = pd.to_datetime(df[UNTIL_KEY])
+    df[DURATION_KEY] = df[UNTIL_KEY] - df[FROM_KEY]
+
+    return df
+
+def legacy_lclog_to_durationlog(log: DataFrame) -> DataFrame:
+    with_id = ('concept:instance' in log.columns)
+    log = log[(log[LIFECYCLE].str.lower() == "start") | (log[LIFECYCLE].str.lower() == "complete")]
+    sort_columns = [CASE_ID_KEY, ACTIVITY_ID_KEY]
+    if with_id:
+        sort_columns += ['concept:instance']
+    sort_columns += [TIMESTAMP]
+    df: DataFrame = log.sort_values(sort_columns).reset_index()
+
+    aux_act = 'aux_act_' + str(time.time())
+    aux_case = 'aux_case_' + str(time.time())
+    aux_timestamp = 'aux_time_' + str(time.time())
+    aux_lifecycle = 'aux_lc_' + str(time.time())
+
+    df[aux_act] = df[ACTIVITY_ID_KEY].shift(1, fill_value=df.at[0, ACTIVITY_ID_KEY])
+    df[aux_case] = df[CASE_ID_KEY].shift(1, fill_value=df.at[0, CASE_ID_KEY])
+    df[aux_timestamp] = df[TIMESTAMP].shift(1, fill_value=df.at[0, TIMESTAMP])
+    df[aux_lifecycle] = df[LIFECYCLE].shift(1, fill_value=df.at[0, LIFECYCLE])
+
+    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], format='ISO8601')
+    df[aux_timestamp] = pd.to_datetime(df[aux_timestamp], format='ISO8601')
+
+    df = df[df[LIFECYCLE].str.lower() == 'complete']
+    with_start = (~(df[aux_lifecycle].str.lower() == 'complete')
+                  & (df[aux_case] == df[CASE_ID_KEY])
+                  & (df[aux_act] == df[ACTIVITY_ID_KEY]))
+    df.loc[with_start, FROM_KEY] = df[with_start][aux_timestamp]
+    df.loc[~with_start, FROM_KEY] = df[~with_start][TIMESTAMP]
+    df[UNTIL_KEY] = df[TIMESTAMP]
+
+    df = df.drop([aux_act, aux_timestamp, aux_case, aux_lifecycle], axis=1)
+
+    df[FROM_KEY] = pd.to_datetime(df[FROM_KEY])
+    df[UNTIL_KEY] = pd.to_datetime(df[UNTIL_KEY])
+    df[DURATION_KEY] = df[UNTIL_KEY] - df[FROM_KEY]
+
+    return df
+
+
+def measure(function, log):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(log)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_bytes': peak, 'rows': len(result)}
+
+
+def run_benchmark(sizes=(10_000, 100_000), output_file=None):
+    srf = load_script('SRF(TB,EB).py', 'srf_tb_eb')
+    converters = {
+        'log_to_durationlog': (legacy_log_to_durationlog, srf.log_to_durationlog, False),
+        'lclog_to_durationlog': (legacy_lclog_to_durationlog, srf.lclog_to_durationlog, True),
+    }
+    results = []
+    for num_cases in sizes:
+        for name, (legacy, current, lifecycle) in converters.items():
+            log = synthetic_log(num_cases, lifecycle=lifecycle)
+            for implementation, function in (('legacy', legacy), ('numpy', current)):
+                results.append({'converter': name, 'implementation': implementation, 'events': len(log),
+                                **measure(function, log)})
+                print(results[-1])
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark(output_file='duration_log_benchmark.json')
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+SRF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Specie Retreival Function')
+sys.path.append(SRF_DIR)
+
+from partitioned_species import partitioned_species
+from species_engine import compute_species_tasks, encode_log, species_tasks, to_species_csv_frame
+from streaming_species import SpeciesAbundanceIndex, scan_lifecycles, stream_species
+from synthetic_log import synthetic_log
+
+CASE_ID_KEY = 'case:concept:name'
+
+
+def assert_same_tables(mode, expected, actual):
+    assert list(actual) == list(expected), (mode, list(actual), list(expected))
+    for name in expected:
+        expected_frame, actual_frame = to_species_csv_frame(name, expected[name]), to_species_csv_frame(name, actual[name])
+        assert expected_frame.equals(actual_frame), f'{mode}: {name} differs from compute_species'
+
+
+def check_modes(num_cases=500, lifecycle=True, k_grams=(2, 3), chunksize=700, memory_budget=20_000, seed=0):
+    """Checks that every extraction mode writes the tables ``compute_species`` computes for the whole log."""
+    # the chunked mode needs the events of a case to be contiguous
+    event_log = synthetic_log(num_cases, lifecycle=lifecycle, seed=seed).sort_values(CASE_ID_KEY, kind='stable')
+    tasks = species_tasks(k_grams=k_grams)
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_csv = os.path.join(work_dir, 'log.csv')
+        event_log.to_csv(input_csv, index=False)
+        expected = compute_species_tasks(encode_log(pd.read_csv(input_csv)), tasks)
+        assert_same_tables('stream_species', expected, stream_species(input_csv, chunksize, k_grams=k_grams))
+        assert_same_tables('partitioned_species', expected, partitioned_species(input_csv, memory_budget, tasks))
+        # the index sees the cases in reverse, in batches of 50, and is saved and reloaded halfway
+        index = SpeciesAbundanceIndex(scan_lifecycles(input_csv), k_grams=k_grams)
+        case_ids = event_log[CASE_ID_KEY].unique()[::-1]
+        index_path = os.path.join(work_dir, 'index.pkl')
+        for start in range(0, len(case_ids), 50):
+            index.add_cases(event_log[event_log[CASE_ID_KEY].isin(case_ids[start:start + 50])])
+            if start == len(case_ids) // 100 * 50:
+                index.save(index_path)
+                index = SpeciesAbundanceIndex.load(index_path)
+        assert_same_tables('SpeciesAbundanceIndex', expected, index.tables())
+    print(f'{len(expected)} species tables agree across modes ({num_cases} cases, lifecycle={lifecycle})')
+
+
+if __name__ == "__main__":
+    check_modes(lifecycle=True)
+    check_modes(lifecycle=False)
@@ -0,0 +1,297 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+SRF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Specie Retreival Function')
+sys.path.append(SRF_DIR)
+
+from log_cache import CACHE_FORMAT
+from species_engine import END_SPECIES, EXPONENTIAL_LAMBDA, START_SPECIES
+from species_store import parse_duration_species
+
+CASE_ID_KEY = 'case:concept:name'
+ACTIVITY_ID_KEY = 'concept:name'
+TIMESTAMP = 'time:timestamp'
+LIFECYCLE = 'lifecycle:transition'
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Dataset', 'Dataset Feture Calculations')
+
+MILLISECOND = 10 ** 6
+MINUTE = 60 * 10 ** 9
+LIFECYCLES = ('start', 'complete')
+
+
+def synthetic_log(num_cases, events_per_case=10, num_activities=25, lifecycle=True, seed=0):
+    rng = np.random.default_rng(seed)
+    num_events = num_cases * events_per_case
+    cases = np.repeat(np.arange(num_cases), events_per_case)
+    activities = rng.integers(0, num_activities, size=num_events)
+    starts = np.datetime64('2020-01-01T00:00:00', 'ns') + rng.integers(0, 10 ** 15, size=num_cases).astype('m8[ns]')
+    gaps = rng.integers(1, 10 ** 12, size=(num_cases, events_per_case)).cumsum(axis=1).ravel()
+    timestamps = starts[cases] + gaps.astype('m8[ns]')
+    log = DataFrame({CASE_ID_KEY: np.char.add('case ', cases.astype(str)).astype(object),
+                     ACTIVITY_ID_KEY: np.char.add('activity ', activities.astype(str)).astype(object),
+                     TIMESTAMP: pd.DatetimeIndex(timestamps).strftime('%Y-%m-%dT%H:%M:%S.%f')})
+    if lifecycle:
+        complete = log.copy()
+        complete[TIMESTAMP] = pd.DatetimeIndex(timestamps + rng.integers(0, 10 ** 11, size=num_events).astype('m8[ns]')) \
+            .strftime('%Y-%m-%dT%H:%M:%S.%f')
+        log[LIFECYCLE] = 'start'
+        complete[LIFECYCLE] = 'complete'
+        log = pd.concat([log, complete], ignore_index=True)
+    return log.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class LogProfile:
+    """Markov model of an event log.
+
+    State 0 of ``transitions`` is ``$START$`` as a row and ``$END$`` as a column, state ``a + 1`` is activity ``a``.
+    Activity durations are drawn uniformly from ``[duration_low, duration_high]`` nanoseconds, where the bin of an
+    event is picked from the bins of its activity in proportion to ``duration_weight``.
+    """
+
+    def __init__(self, activities, transitions, duration_activity=None, duration_low=None, duration_high=None,
+                 duration_weight=None, num_cases=1000, variant_skew=1.0, num_variants=None, max_trace_length=200,
+                 mean_wait=30 * MINUTE):
+        self.activities = np.asarray(activities, dtype=object)
+        transitions = np.asarray(transitions, dtype=np.float64)
+        totals = transitions.sum(axis=1, keepdims=True)
+        # activities never followed by anything end the trace
+        transitions[:, 0] = np.where(totals[:, 0] > 0, transitions[:, 0], 1)
+        self.transitions = transitions / transitions.sum(axis=1, keepdims=True)
+
+        num_activities = len(self.activities)
+        if duration_activity is None:
+            duration_activity = np.arange(num_activities)
+            duration_low = np.zeros(num_activities)
+            duration_high = np.full(num_activities, 60 * MINUTE)
+            duration_weight = np.ones(num_activities)
+        missing = np.setdiff1d(np.arange(num_activities), duration_activity)
+        order = np.argsort(np.r_[duration_activity, missing], kind='stable')
+        self.duration_activity = np.r_[duration_activity, missing].astype(np.int64)[order]
+        self.duration_low = np.r_[duration_low, np.zeros(len(missing))][order]
+        self.duration_high = np.r_[duration_high, np.zeros(len(missing))][order]
+        weights = np.r_[duration_weight, np.ones(len(missing))][order].astype(np.float64)
+        # each activity's bins cover [a, a + 1) so one searchsorted picks a bin for every event
+        totals = np.bincount(self.duration_activity, weights, minlength=num_activities)
+        bins_per_activity = np.bincount(self.duration_activity, minlength=num_activities)
+        within = np.cumsum(weights) - np.repeat(np.cumsum(totals) - totals, bins_per_activity)
+        self.duration_bounds = self.duration_activity + within / totals[self.duration_activity]
+
+        self.num_cases = num_cases
+        self.variant_skew = variant_skew
+        self.num_variants = num_variants if num_variants is not None else max(1, num_cases // 3)
+        self.max_trace_length = max_trace_length
+        self.mean_wait = mean_wait
+
+    @property
+    def num_activities(self) -> int:
+        return len(self.activities)
+
+    def variant_probabilities(self) -> np.ndarray:
+        weights = np.arange(1, self.num_variants + 1, dtype=np.float64) ** -self.variant_skew
+        return weights / weights.sum()
+
+
+def uniform_profile(num_activities=25, mean_trace_length=10, num_cases=1000, variant_skew=1.0, num_variants=None,
+                    seed=0, **params) -> LogProfile:
+    """Random dense directly-follows graph whose trace lengths are geometric with the given mean."""
+    rng = np.random.default_rng(seed)
+    transitions = np.zeros((num_activities + 1, num_activities + 1))
+    transitions[:, 1:] = rng.random((num_activities + 1, num_activities))
+    transitions[1:, 1:] *= (1 - 1 / mean_trace_length) / transitions[1:, 1:].sum(axis=1, keepdims=True)
+    transitions[1:, 0] = 1 / mean_trace_length
+    activities = [f'activity {a}' for a in range(num_activities)]
+    return LogProfile(activities, transitions, num_cases=num_cases, variant_skew=variant_skew,
+                      num_variants=num_variants, **params)
+
+
+def fit_zipf_exponent(counts) -> float:
+    """Least-squares slope of log(count) over log(rank), counts sorted in decreasing order."""
+    counts = np.sort(np.asarray(counts, dtype=np.float64))[::-1]
+    if len(counts) < 2:
+        return 1.0
+    ranks = np.log(np.arange(1, len(counts) + 1))
+    slope = np.polyfit(ranks, np.log(counts), 1)[0]
+    return float(max(-slope, 0.0))
+
+
+def fit_profile(dataset_dir, num_cases=None, variant_skew=None, num_variants=None, **params) -> LogProfile:
+    """Fits a profile to the species tables of one dataset, e.g. ``fit_profile(os.path.join(DATASET_DIR, 'Sepsis'))``.
+
+    The directly-follows table gives the transition matrix and the number of cases, the exponential duration table the
+    activity durations and the trace variant table, when present, the variant skew and the number of variants.
+    """
+    activity_table = pd.read_csv(os.path.join(dataset_dir, 'activity_species.csv'))
+    activities = pd.Index(sorted(activity_table['activity'].astype(str)))
+    states = activities.insert(0, START_SPECIES)
+
+    df_table = pd.read_csv(os.path.join(dataset_dir, 'directly_follows_species.csv'))
+    pairs = df_table['directly_follows'].str.split('->', n=1, expand=True)
+    sources = states.get_indexer(pairs[0])
+    targets = states.get_indexer(pairs[1].replace(END_SPECIES, START_SPECIES))
+    known = (sources >= 0) & (targets >= 0)
+    transitions = np.zeros((len(states), len(states)))
+    np.add.at(transitions, (sources[known], targets[known]), df_table['count'].to_numpy()[known])
+    if num_cases is None:
+        num_cases = int(transitions[0].sum())
+
+    duration_params = {}
+    duration_file = os.path.join(dataset_dir, 'exponential_duration_species_zte2.csv')
+    if os.path.exists(duration_file):
+        duration_table = pd.read_csv(duration_file)
+        labels, bins = parse_duration_species(duration_table['Activity'])
+        duration_activity = activities.get_indexer(labels)
+        known = duration_activity >= 0
+        bins = bins[known]
+        scale = EXPONENTIAL_LAMBDA * MINUTE
+        with np.errstate(over='ignore'):
+            high = np.where(np.isneginf(bins), 0, scale * np.exp2(np.maximum(bins, 0)))
+        low = np.where(bins >= 1, high / 2, 0)
+        duration_params = dict(duration_activity=duration_activity[known], duration_low=low, duration_high=high,
+                               duration_weight=duration_table['Count'].to_numpy()[known])
+
+    variant_file = os.path.join(dataset_dir, 'trace_variant_species.csv')
+    if os.path.exists(variant_file):
+        variant_counts = pd.read_csv(variant_file)['count'].to_numpy()
+        if variant_skew is None:
+            variant_skew = fit_zipf_exponent(variant_counts)
+        if num_variants is None:
+            num_variants = len(variant_counts)
+    return LogProfile(activities, transitions, num_cases=num_cases,
+                      variant_skew=1.0 if variant_skew is None else variant_skew, num_variants=num_variants,
+                      **duration_params, **params)
+
+
+def generate_variants(profile: LogProfile, rng):
+    """Walks every variant through the transition matrix at once; returns flat activity codes and variant offsets."""
+    cumulative = np.cumsum(profile.transitions, axis=1)
+    cumulative[:, -1] = 1.0
+    walks = np.full((profile.num_variants, profile.max_trace_length), -1, dtype=np.int32)
+    state = np.zeros(profile.num_variants, dtype=np.int64)
+    active = np.arange(profile.num_variants)
+    for step in range(profile.max_trace_length):
+        rows = cumulative[state[active]]
+        # the first step never ends the trace, so every variant has at least one event
+        if step == 0:
+            rows = (rows - rows[:, :1]) / (1 - rows[:, :1])
+        state[active] = (rows < rng.random(len(active))[:, np.newaxis]).sum(axis=1)
+        active = active[state[active] > 0]
+        walks[active, step] = state[active] - 1
+        if not len(active):
+            break
+    lengths = (walks >= 0).sum(axis=1)
+    return walks[walks >= 0], np.r_[0, np.cumsum(lengths)]
+
+
+def _case_chunks(profile: LogProfile, num_cases, chunk_cases, lifecycle, seed, start):
+    rng = np.random.default_rng(seed)
+    variant_codes, variant_offsets = generate_variants(profile, rng)
+    variant_lengths = np.diff(variant_offsets)
+    case_variants = rng.choice(profile.num_variants, size=num_cases, p=profile.variant_probabilities())
+    num_events = int(variant_lengths[case_variants].sum()) * (2 if lifecycle else 1)
+    yield num_events
+
+    start = np.datetime64(start, 'ns').astype(np.int64)
+    span = 365 * 24 * 60 * MINUTE
+    for first in range(0, num_cases, chunk_cases):
+        variants = case_variants[first:first + chunk_cases]
+        lengths = variant_lengths[variants]
+        case_offsets = np.r_[0, np.cumsum(lengths)]
+        cases = np.repeat(np.arange(first, first + len(variants), dtype=np.int64), lengths)
+        positions = np.arange(case_offsets[-1]) - np.repeat(case_offsets[:-1], lengths)
+        activities = variant_codes[np.repeat(variant_offsets[variants], lengths) + positions]
+
+        picked = np.searchsorted(profile.duration_bounds, activities + rng.random(len(activities)), side='right')
+        picked = np.minimum(picked, len(profile.duration_bounds) - 1)
+        low, high = profile.duration_low[picked], profile.duration_high[picked]
+        # whole milliseconds, so the CSV and columnar outputs of one seed hold identical timestamps
+        durations = (low + (high - low) * rng.random(len(activities))).astype(np.int64) // MILLISECOND * MILLISECOND
+
+        steps = durations
+        if lifecycle:
+            steps = steps + rng.exponential(profile.mean_wait, len(activities)).astype(np.int64) // MILLISECOND \
+                * MILLISECOND
+        elapsed = np.cumsum(steps)
+        elapsed -= np.repeat(elapsed[case_offsets[:-1]] - steps[case_offsets[:-1]], lengths)
+        case_starts = start + rng.integers(0, span // MILLISECOND, size=len(variants)) * MILLISECOND
+        until = np.repeat(case_starts, lengths) + elapsed
+
+        if lifecycle:
+            timestamps = np.stack([until - durations, until], axis=1).ravel()
+            yield np.repeat(cases, 2), np.repeat(activities, 2), timestamps, np.tile(np.arange(2, dtype=np.int8),
+                                                                                     len(cases))
+        else:
+            yield cases, activities, until, None
+
+
+def write_csv_log(profile: LogProfile, path, num_cases=None, chunk_cases=100_000, lifecycle=True, seed=0,
+                  start='2020-01-01') -> int:
+    """Streams a generated log to CSV chunk by chunk; returns the number of events written.
+
+    The same seed and ``chunk_cases`` give the same events as ``write_columnar_log``.
+    """
+    chunks = _case_chunks(profile, profile.num_cases if num_cases is None else num_cases, chunk_cases, lifecycle,
+                          seed, start)
+    num_events = next(chunks)
+    header = True
+    with open(path, 'w', newline='') as f:
+        for cases, activities, timestamps, lifecycles in chunks:
+            chunk = DataFrame({CASE_ID_KEY: np.char.add('case ', cases.astype(str)),
+                               ACTIVITY_ID_KEY: profile.activities[activities],
+                               TIMESTAMP: np.datetime_as_string(timestamps.astype('M8[ns]'), unit='ms',
+                                                                timezone='UTC')})
+            if lifecycles is not None:
+                chunk[LIFECYCLE] = np.asarray(LIFECYCLES, dtype=object)[lifecycles]
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+    return num_events
+
+
+def write_columnar_log(profile: LogProfile, path, num_cases=None, chunk_cases=100_000, lifecycle=True, seed=0,
+                       start='2020-01-01') -> int:
+    """Streams a generated log into the event log cache layout, so ``log_cache.read_encoded_log(path)`` maps it."""
+    num_cases = profile.num_cases if num_cases is None else num_cases
+    chunks = _case_chunks(profile, num_cases, chunk_cases, lifecycle, seed, start)
+    num_events = next(chunks)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+    dtypes = {'case_codes': np.int64, 'activity_codes': np.int32, 'timestamps': np.int64}
+    if lifecycle:
+        dtypes['lifecycle_codes'] = np.int8
+    columns = {column: np.lib.format.open_memmap(os.path.join(staging, f'{column}.npy'), mode='w+', dtype=dtype,
+                                                 shape=(num_events,))
+               for column, dtype in dtypes.items()}
+    written = 0
+    for chunk in chunks:
+        for column, values in zip(dtypes, chunk):
+            columns[column][written:written + len(chunk[0])] = values
+        written += len(chunk[0])
+    for values in columns.values():
+        values.flush()
+    del columns
+
+    labels = {'format': CACHE_FORMAT, 'cases': [f'case {c}' for c in range(num_cases)],
+              'activities': profile.activities.tolist(), 'lifecycles': list(LIFECYCLES) if lifecycle else None,
+              'instances': None}
+    with open(os.path.join(staging, 'labels.json'), 'w', encoding='utf-8') as f:
+        json.dump(labels, f)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(staging, path)
+    return num_events
+
+
+if __name__ == "__main__":
+    profile = fit_profile(os.path.join(DATASET_DIR, 'BPI-2019'))
+    print(f"{profile.num_activities} activities, {profile.num_cases} cases, {profile.num_variants} variants, "
+          f"variant skew {profile.variant_skew:.2f}")
+    print(f"Events written: {write_csv_log(profile, 'synthetic_bpi_2019.csv')}")
@@ -1,10 +1,39 @@
 import pandas as pd
+import numpy as np
 import os
-import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Specie Retreival Function'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Estimators'))
+
+from breeding import BredSample, PrefixJoin
+from log_cache import load_encoded_log, load_event_log
+from profiling import span
+from species_engine import (ACTIVITY_ID_KEY, EVENT_INSTANCE_KEY, LIFECYCLE, TIMESTAMP, case_species_incidence,
+                            compute_all_species, duration_arrays, encode_log, sortable_timestamps, species_counts,
+                            species_tasks, to_nanoseconds)
+from species_estimators import ESTIMATORS, estimate_species, estimate_species_batch, frequency_matrix
+
+CASE_ID_KEY = 'case:concept:name'
+
+
+_bootstrap = None
+
+
+def _init_sample_worker(bootstrap):
+    global _bootstrap
+    _bootstrap = bootstrap
+
+
+def _sample_task(task, i, seed_sequence):
+    return getattr(_bootstrap, task)(i, np.random.default_rng(seed_sequence))
 
 
 class LSMbrBootstrapGeneralization:
-    def __init__(self, input_csv, output_dir, sample_size, num_samples, generations, subtrace_length, breeding_prob):
+    def __init__(self, input_csv, output_dir, sample_size, num_samples, generations, subtrace_length, breeding_prob,
+                 seed=None, max_workers=1, write_samples=False, operator=None, keep_unbred_pairs=False):
         self.input_csv = input_csv
         self.output_dir = output_dir
         self.sample_size = sample_size
@@ -12,48 +41,198 @@ class LSMbrBootstrapGeneralization:
         self.generations = generations
         self.subtrace_length = subtrace_length
         self.breeding_prob = breeding_prob
-        self.event_log = pd.read_csv(input_csv)
-        self.traces = self.event_log.groupby('case:concept:name')
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.max_workers = max_workers
+        self.write_samples = write_samples
+        self.operator = PrefixJoin(subtrace_length) if operator is None else operator
+        self.keep_unbred_pairs = keep_unbred_pairs
+        self.species_log = None
+        # CSV and XES logs alike; rows without a case or activity are already dropped
+        event_log = load_event_log(input_csv)
+        self.activity_codes = self.timestamps = None
+        with span('bootstrap.index_cases', rows=len(event_log)):
+            case_codes, self.case_ids = pd.factorize(event_log[CASE_ID_KEY], sort=True)
+            if self.operator.relabel:
+                # crossover points are positions in time, so traces are put in timestamp order
+                timestamps = to_nanoseconds(event_log[TIMESTAMP])
+                order = np.lexsort((sortable_timestamps(timestamps), case_codes))
+                self.timestamps = timestamps[order]
+                self.activity_codes = pd.factorize(event_log[ACTIVITY_ID_KEY])[0][order]
+            else:
+                order = np.argsort(case_codes, kind='stable')
+            self.event_log = event_log.take(order).reset_index(drop=True)
+        self.case_offsets = np.searchsorted(case_codes[order], np.arange(len(self.case_ids) + 1))
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+    def sample_seeds(self):
+        return self.seed_sequence.spawn(self.num_samples)
+
+    def map_samples(self, task):
+        seeds = self.sample_seeds()
+        if self.max_workers == 1:
+            for i, seed_sequence in enumerate(seeds):
+                yield getattr(self, task)(i, np.random.default_rng(seed_sequence))
+            return
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_sample_worker,
+                                 initargs=(self,)) as executor:
+            yield from executor.map(_sample_task, repeat(task), range(self.num_samples), seeds)
+
     def generate_samples(self):
-        for i in range(self.num_samples):
-            sampled_log = self.log_sampling_with_breeding()
-            output_file = os.path.join(self.output_dir, f'sample_{i + 1}.csv')
-            sampled_log.to_csv(output_file, index=False)
+        for i, output_file in enumerate(self.map_samples('write_sample')):
             print(f'Sample {i + 1} saved to {output_file}')
 
-    def log_sampling_with_breeding(self):
-        sampled_log = pd.DataFrame(columns=self.event_log.columns)
-        for _ in range(self.generations):
-            case_ids = random.sample(list(self.traces.groups.keys()), k=self.sample_size)
-            traces = [self.traces.get_group(cid) for cid in case_ids]
-            for j in range(0, len(traces) - 1, 2):
-                if random.random() < self.breeding_prob:
-                    trace1, trace2 = traces[j], traces[j + 1]
-                    new_trace = self.crossover_subtrace(trace1, trace2)
-                    sampled_log = pd.concat([sampled_log, new_trace])
-                else:
-                    sampled_log = pd.concat([sampled_log, traces[j]])
-        return sampled_log
+    def write_sample(self, i, rng, sample=None):
+        if sample is None:
+            sample = self.breed_sample(rng)
+        output_file = os.path.join(self.output_dir, f'sample_{i + 1}.csv')
+        with span('bootstrap.write_sample') as write:
+            sampled_log = self.take_sample(self.event_log, sample)
+            sampled_log.to_csv(output_file, index=False)
+            write.rows = len(sampled_log)
+        return output_file
+
+    def estimate_sample(self, i, rng, estimators=ESTIMATORS):
+        sample = self.breed_sample(rng)
+        if self.write_samples:
+            self.write_sample(i, rng, sample)
+        tables = compute_all_species(encode_log(self.take_sample(self.species_log, sample)))
+        with span('estimators.estimate_species', rows=len(tables)):
+            return [{'Replicate': i + 1, 'Species': name, **estimate_species(species_counts(table), estimators)}
+                    for name, table in tables.items()]
+
+    def generate_replicate_results(self, output_file=None):
+        if self.species_log is None:
+            columns = [column for column in (CASE_ID_KEY, ACTIVITY_ID_KEY, TIMESTAMP, LIFECYCLE, EVENT_INSTANCE_KEY)
+                       if column in self.event_log.columns]
+            self.species_log = self.event_log[columns].copy()
+            with span('log.to_datetime', rows=len(self.species_log)):
+                self.species_log[TIMESTAMP] = pd.to_datetime(self.species_log[TIMESTAMP], format='ISO8601',
+                                                             errors='coerce', utc=True)
+        with span('bootstrap.replicates', samples=self.num_samples, workers=self.max_workers):
+            results = pd.DataFrame([row for rows in self.map_samples('estimate_sample') for row in rows])
+        if output_file is not None:
+            results.to_csv(output_file, index=False)
+        return results
 
-    def crossover_subtrace(self, trace1, trace2):
-        trace1_events = trace1.to_dict('records')
-        trace2_events = trace2.to_dict('records')
-        len1 = min(len(trace1_events), self.subtrace_length)
-        len2 = min(len(trace2_events), self.subtrace_length)
-        subtrace1 = trace1_events[:len1]
-        subtrace2 = trace2_events[:len2]
-        new_trace_events = subtrace1 + subtrace2
-        new_trace_df = pd.DataFrame(new_trace_events)
-        return new_trace_df
+    def log_sampling_with_breeding(self, rng=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.take_sample(self.event_log, self.breed_sample(rng))
+
+    def sample_rows(self, rng):
+        return self.breed_sample(rng).rows
+
+    def breed_sample(self, rng) -> BredSample:
+        """Breeds all pairs of every generation at once; unbred pairs pass on their first parent, or both."""
+        with span('bootstrap.breeding', generations=self.generations) as breeding:
+            sample = self.concatenated([self.breed_generation(rng) for _ in range(self.generations)])
+            breeding.rows = int(sample.bred.sum())
+        return sample
+
+    def breed_generation(self, rng) -> BredSample:
+        cases = rng.choice(len(self.case_ids), size=self.sample_size, replace=False)
+        first, second = cases[0:-1:2], cases[1::2]
+        bred = rng.random(len(first)) < self.breeding_prob
+        starts, stops, crossed = self.operator.segments(first, second, self.case_offsets, self.activity_codes, rng)
+        # a pair the operator could not cross passes its first parent on as an unbred trace
+        bred &= crossed
+        starts[~bred, 0] = self.case_offsets[first[~bred]]
+        stops[~bred, 0] = self.case_offsets[first[~bred] + 1]
+        stops[~bred, 1:] = starts[~bred, 1:]
+        if self.keep_unbred_pairs:
+            starts[~bred, 1] = self.case_offsets[second[~bred]]
+            stops[~bred, 1] = self.case_offsets[second[~bred] + 1]
+        return BredSample(starts, stops, first, second, bred)
+
+    @staticmethod
+    def concatenated(samples) -> BredSample:
+        if not samples:
+            empty = np.zeros((0, 2), dtype=np.int64)
+            return BredSample(empty, empty, empty[:, 0], empty[:, 0], np.zeros(0, dtype=bool))
+        return BredSample(*(np.concatenate([getattr(sample, column) for sample in samples])
+                            for column in ('starts', 'stops', 'first', 'second', 'bred')))
+
+    def take_sample(self, frame, sample: BredSample):
+        """The sample's events of ``frame``; traces bred by a relabelling operator become cases of their own."""
+        sampled_log = frame.take(sample.rows)
+        if not self.operator.relabel:
+            return sampled_log
+        case_ids = np.asarray(self.case_ids).astype(str).astype(object)
+        traces = sample.traces()
+        bred = sample.bred[traces]
+        labels = case_ids[np.searchsorted(self.case_offsets, sample.rows, 'right') - 1]
+        children = case_ids[sample.first[sample.bred]] + '+' + case_ids[sample.second[sample.bred]]
+        labels[bred] = children[np.cumsum(sample.bred)[traces[bred]] - 1]
+        sampled_log[CASE_ID_KEY] = labels
+        sampled_log[TIMESTAMP] = pd.to_datetime(sample.aligned_timestamps(self.timestamps, self.case_offsets),
+                                                utc=True)
+        return sampled_log
 
     def run(self):
         print(f"Generating {self.num_samples} bootstrapped samples with breeding...")
         self.generate_samples()
         print("Sample generation complete.")
 
+    def run_pipeline(self):
+        print(f"Estimating species richness over {self.num_samples} bootstrapped samples...")
+        output_file = os.path.join(self.output_dir, 'replicate_results.csv')
+        results = self.generate_replicate_results(output_file)
+        print(results)
+        print(f"Results saved to: {output_file}")
+
+
+class AbundanceBootstrap:
+    """Bootstraps species abundance vectors by resampling cases, without building event frames.
+
+    The case x species incidence of every species kind is computed once; a replicate draws
+    multinomial case weights and gets its abundances as one sparse matrix-vector product.
+    """
+
+    def __init__(self, input_csv, num_replicates, seed=None, estimators=ESTIMATORS, tasks=None):
+        self.num_replicates = num_replicates
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.estimators = estimators
+        log = load_encoded_log(input_csv)
+        self.num_cases = log.num_cases
+        with span('species.durations', rows=len(log)):
+            durations = duration_arrays(log)
+        if tasks is None:
+            tasks = species_tasks()
+        self.incidence = {}
+        for name, (kind, params) in tasks.items():
+            with span(f'bootstrap.incidence.{name}', rows=len(log)):
+                self.incidence[name] = case_species_incidence(log, kind, params, durations)
+
+    def replicate_weights(self, rng):
+        return np.bincount(rng.integers(0, self.num_cases, size=self.num_cases), minlength=self.num_cases)
+
+    def abundances(self, name, weights):
+        cases, species, values, num_species = self.incidence[name]
+        return np.bincount(species, weights=weights[cases] * values, minlength=num_species).astype(np.int64)
+
+    def generate_replicate_results(self):
+        frequencies = {name: [] for name in self.incidence}
+        with span('bootstrap.replicate_abundances', rows=self.num_replicates):
+            for seed_sequence in self.seed_sequence.spawn(self.num_replicates):
+                weights = self.replicate_weights(np.random.default_rng(seed_sequence))
+                for name in self.incidence:
+                    frequencies[name].append(frequency_matrix(self.abundances(name, weights)[np.newaxis, :]))
+
+        replicates = np.arange(1, self.num_replicates + 1)
+        with span('estimators.batch', rows=self.num_replicates * len(frequencies)):
+            results = [pd.DataFrame({'Replicate': replicates, 'Species': name,
+                                     **estimate_species_batch(np.concatenate(rows), self.estimators)})
+                       for name, rows in frequencies.items()]
+        return pd.concat(results).sort_values('Replicate', kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def confidence_intervals(results, level=0.95):
+        alpha = (1 - level) / 2
+        metrics = results.drop(columns=['Replicate']).groupby('Species', sort=False)
+        return pd.concat({'Mean': metrics.mean(), 'Lower': metrics.quantile(alpha),
+                          'Upper': metrics.quantile(1 - alpha)}, axis=1)
+
 
 if __name__ == "__main__":
     input_csv = "/kaggle/input/final-dataset-thesis/dataset_csv/Sepsis.csv"
@@ -63,6 +242,18 @@ if __name__ == "__main__":
     generations = 5
     subtrace_length = 10
     breeding_prob = 0.5
+    seed = 42
+    max_workers = os.cpu_count()
+    # or SinglePointCrossover() / KPointCrossover(k) from breeding
+    operator = PrefixJoin(subtrace_length)
+    # True estimates every sample in memory (run_pipeline); False only writes the samples as CSVs (run)
+    estimate_in_memory = True
+    # with estimate_in_memory, also keep every sample_{i}.csv
+    write_samples = False
     bootstrap = LSMbrBootstrapGeneralization(input_csv, output_dir, sample_size, num_samples, generations,
-                                             subtrace_length, breeding_prob)
-    bootstrap.run()
+                                             subtrace_length, breeding_prob, seed, max_workers,
+                                             write_samples=write_samples, operator=operator)
+    if estimate_in_memory:
+        bootstrap.run_pipeline()
+    else:
+        bootstrap.run()
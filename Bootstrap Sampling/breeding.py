@@ -0,0 +1,155 @@
+import numpy as np
+
+NAT = np.iinfo(np.int64).min
+
+
+def gather_ranges(starts, stops):
+    lengths = stops - starts
+    shifts = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return shifts + np.arange(lengths.sum())
+
+
+def parent_ranges(parents, case_offsets):
+    return case_offsets[parents], case_offsets[parents + 1]
+
+
+class PrefixJoin:
+    """The first ``length`` events of the first parent followed by the first ``length`` of the second.
+
+    This is the original operator: both parts keep their parents' case ids.
+    """
+
+    relabel = False
+
+    def __init__(self, length):
+        self.length = length
+
+    def segments(self, first, second, case_offsets, activity_codes, rng):
+        starts = np.stack([case_offsets[first], case_offsets[second]], axis=1)
+        lengths = np.stack([case_offsets[first + 1], case_offsets[second + 1]], axis=1) - starts
+        return starts, starts + np.minimum(lengths, self.length), np.ones(len(first), dtype=bool)
+
+
+class SinglePointCrossover:
+    """``first[:i] + second[j:]`` for an event pair ``(i, j)`` of the same activity, drawn uniformly.
+
+    Every event of both parents is keyed by (pair, activity); the matches of a first-parent event
+    are one contiguous run of the sorted second-parent keys, so all pairs draw their cut at once.
+    Events without an activity (code -1) match nothing. Parents without a shared activity pass
+    the first parent on unchanged and are not counted as bred.
+    """
+
+    relabel = True
+
+    def segments(self, first, second, case_offsets, activity_codes, rng):
+        first_starts, first_stops = parent_ranges(first, case_offsets)
+        second_starts, second_stops = parent_ranges(second, case_offsets)
+        pairs = np.arange(len(first))
+        num_activities = np.int64(activity_codes.max()) + 1 if len(activity_codes) else np.int64(1)
+
+        first_rows = gather_ranges(first_starts, first_stops)
+        first_pairs = np.repeat(pairs, first_stops - first_starts)
+        known = activity_codes[first_rows] >= 0
+        first_rows, first_pairs = first_rows[known], first_pairs[known]
+        first_keys = first_pairs * num_activities + activity_codes[first_rows]
+        second_rows = gather_ranges(second_starts, second_stops)
+        second_pairs = np.repeat(pairs, second_stops - second_starts)
+        known = activity_codes[second_rows] >= 0
+        second_rows, second_pairs = second_rows[known], second_pairs[known]
+        second_keys = second_pairs * num_activities + activity_codes[second_rows]
+        order = np.argsort(second_keys, kind='stable')
+        second_keys, second_rows = second_keys[order], second_rows[order]
+
+        match_starts = np.searchsorted(second_keys, first_keys, 'left')
+        matches = np.searchsorted(second_keys, first_keys, 'right') - match_starts
+        match_ends = np.cumsum(matches)
+        totals = np.bincount(first_pairs, weights=matches, minlength=len(first)).astype(np.int64)
+        crossed = totals > 0
+        draws = (np.cumsum(totals) - totals + rng.integers(0, np.maximum(totals, 1)))[crossed]
+        events = np.searchsorted(match_ends, draws, 'right')
+        second_cuts = second_rows[match_starts[events] + draws - (match_ends[events] - matches[events])]
+
+        starts = np.stack([first_starts, second_starts], axis=1)
+        stops = np.stack([first_stops, second_starts], axis=1)
+        stops[crossed, 0] = first_rows[events]
+        starts[crossed, 1] = second_cuts
+        stops[crossed, 1] = second_stops[crossed]
+        return starts, stops, crossed
+
+
+class KPointCrossover:
+    """Cuts both parents at the same ``k`` relative positions and alternates their segments, first parent first."""
+
+    relabel = True
+
+    def __init__(self, k=2):
+        self.k = k
+
+    def segments(self, first, second, case_offsets, activity_codes, rng):
+        first_starts, first_stops = parent_ranges(first, case_offsets)
+        second_starts, second_stops = parent_ranges(second, case_offsets)
+        positions = np.sort(rng.random((len(first), self.k)), axis=1)
+
+        def boundaries(starts, stops):
+            lengths = (stops - starts)[:, np.newaxis]
+            cuts = np.floor(positions * lengths).astype(np.int64)
+            return starts[:, np.newaxis] + np.concatenate([np.zeros_like(lengths), cuts, lengths], axis=1)
+
+        first_cuts, second_cuts = boundaries(first_starts, first_stops), boundaries(second_starts, second_stops)
+        from_first = np.arange(self.k + 1) % 2 == 0
+        starts = np.where(from_first, first_cuts[:, :-1], second_cuts[:, :-1])
+        stops = np.where(from_first, first_cuts[:, 1:], second_cuts[:, 1:])
+        return starts, stops, np.ones(len(first), dtype=bool)
+
+
+class BredSample:
+    """One bootstrap sample as event row ranges: trace ``i`` is rows ``starts[i, m]:stops[i, m]`` over segments ``m``.
+
+    ``first``/``second`` are the parents of each trace and ``bred`` marks traces made by the
+    operator; the others are unbred parents.
+    """
+
+    def __init__(self, starts, stops, first, second, bred):
+        self.starts = starts
+        self.stops = stops
+        self.first = first
+        self.second = second
+        self.bred = bred
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def rows(self) -> np.ndarray:
+        return gather_ranges(self.starts.ravel(), self.stops.ravel())
+
+    def traces(self) -> np.ndarray:
+        """Trace of every row."""
+        return np.repeat(np.arange(len(self)), (self.stops - self.starts).sum(axis=1))
+
+    def aligned_timestamps(self, timestamps, case_offsets) -> np.ndarray:
+        """Timestamps of every row, with each segment of a bred trace shifted to follow the previous one.
+
+        A segment keeps the gap to the event before it in its own parent, so durations within a
+        segment and at its border stay those of the parent.
+        """
+        shifts = np.zeros(self.starts.shape, dtype=np.int64)
+        previous_end = np.full(len(self), NAT)
+        for m in range(self.starts.shape[1]):
+            starts, stops = self.starts[:, m], self.stops[:, m]
+            present = stops > starts
+            at = np.where(present, starts, 0)
+            begin = timestamps[at] if len(timestamps) else np.zeros(len(self), dtype=np.int64)
+            case_start = case_offsets[np.searchsorted(case_offsets, at, 'right') - 1]
+            before = timestamps[np.maximum(at - 1, 0)] if len(timestamps) else begin
+            gap = np.where((at > case_start) & (before != NAT), np.maximum(begin - before, 0), 0)
+            shift = previous_end - (begin - gap)
+            shift[~present | ~self.bred | (previous_end == NAT) | (begin == NAT)] = 0
+            shifts[:, m] = shift
+            ends = timestamps[np.maximum(stops - 1, 0)] if len(timestamps) else begin
+            previous_end = np.where(present & (ends != NAT), ends + shift, previous_end)
+
+        rows = self.rows
+        aligned = timestamps[rows] + np.repeat(shifts.ravel(), (self.stops - self.starts).ravel())
+        aligned[timestamps[rows] == NAT] = NAT
+        return aligned
@@ -1,29 +1,7 @@
 import pandas as pd
 import os
 
-def ace_estimator(df, count_col, rare_threshold=5):
-    rare_species = df[df[count_col] <= rare_threshold]
-    common_species = df[df[count_col] > rare_threshold]
-
-    S_rare = len(rare_species)
-    S_common = len(common_species)
-    n_rare = rare_species[count_col].sum()
-    F1 = len(df[df[count_col] == 1])
-
-    if n_rare > 0:
-        C_ACE = 1 - (F1 / n_rare)
-    else:
-        C_ACE = 1
-
-    if C_ACE > 0:
-        S_ACE = (S_rare / C_ACE) + S_common
-    else:
-        S_ACE = S_rare + S_common
-
-    S_obs = len(df)
-    S_ACE = max(S_ACE, S_obs)
-
-    return round(S_ACE)
+from species_estimators import AbundanceProfile, ace_simplified
 
 data_dir = "/kaggle/input/dear-lord-kill-me-now/Sepsis"
 
@@ -43,8 +21,9 @@ for file, count_col in files_of_interest.items():
     file_path = os.path.join(data_dir, file)
     df = pd.read_csv(file_path)
 
-    S_ACE = ace_estimator(df, count_col, rare_threshold=5)
-    S_obs = len(df)
+    profile = AbundanceProfile.from_counts(df[count_col])
+    S_ACE = ace_simplified(profile, rare_threshold=5)
+    S_obs = profile.S_obs
 
     results.append([file, S_obs, S_ACE])
 
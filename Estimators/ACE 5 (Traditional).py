@@ -1,32 +1,7 @@
 import pandas as pd
 import os
 
-def ace_estimator(df, count_col):
-    rare_species = df[df[count_col] <= 5]
-    abundant_species = df[df[count_col] > 5]
-
-    S_obs = len(df)
-    S_rare = len(rare_species)
-    n_rare = rare_species[count_col].sum()
-    F1 = len(df[df[count_col] == 1])
-
-    if n_rare > 0:
-        C_ACE = 1 - (F1 / n_rare)
-    else:
-        C_ACE = 0
-
-    sum_i_i_minus_1_Fi = sum(i * (i - 1) * len(df[df[count_col] == i]) for i in range(1, 11))
-    if n_rare > 1:
-        gamma_sq_ACE = (S_rare / C_ACE) * (sum_i_i_minus_1_Fi / (n_rare * (n_rare - 1)))
-    else:
-        gamma_sq_ACE = 0
-
-    if C_ACE > 0:
-        S_ACE = S_rare + (F1 / C_ACE) * gamma_sq_ACE
-    else:
-        S_ACE = S_obs
-
-    return round(S_ACE)
+from species_estimators import AbundanceProfile, ace_traditional
 
 data_dir = "/kaggle/input/dear-lord-kill-me-now/Sepsis"
 
@@ -46,8 +21,9 @@ for file, count_col in files_of_interest.items():
     file_path = os.path.join(data_dir, file)
     df = pd.read_csv(file_path)
 
-    S_ACE = ace_estimator(df, count_col)
-    S_obs = len(df)
+    profile = AbundanceProfile.from_counts(df[count_col])
+    S_ACE = ace_traditional(profile)
+    S_obs = profile.S_obs
 
     results.append([file, S_obs, S_ACE])
 
@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Specie Retreival Function'))
+
+from profiling import enable_profiling, span
+from species_estimators import ESTIMATORS, AbundanceProfile, estimate_species
+from species_store import STORE_SUFFIX, read_species_table
+
+files_of_interest = {
+    'activity_species.csv': 'count',
+    'directly_follows_species.csv': 'count',
+    'exponential_duration_species_zte2.csv': 'Count',
+    'trace_variant_species.csv': 'count',
+    'uniform_duration_species_zt1.csv': 'Count',
+    'uniform_duration_species_zt5.csv': 'Count',
+    'uniform_duration_species_zt30.csv': 'Count'
+}
+
+
+def typed_table_path(data_dir, file):
+    return os.path.join(data_dir, os.path.splitext(file)[0] + STORE_SUFFIX)
+
+
+def process_file(file_info):
+    data_dir, file, count_col, estimators = file_info
+    store_path = typed_table_path(data_dir, file)
+    with span('estimators.read_table', file=file) as read:
+        if os.path.exists(store_path):
+            counts = read_species_table(store_path).counts
+        else:
+            counts = pd.read_csv(os.path.join(data_dir, file), usecols=[count_col])[count_col]
+        read.rows = len(counts)
+    with span('estimators.profile', rows=len(counts)):
+        profile = AbundanceProfile.from_counts(counts)
+    with span('estimators.estimate_species', rows=profile.S_obs):
+        estimates = estimate_species(profile, estimators)
+    return {'Dataset': os.path.basename(os.path.normpath(data_dir)), 'File': file, **estimates}
+
+
+def run_estimators(data_dirs, estimators=ESTIMATORS, max_workers=None) -> pd.DataFrame:
+    """Every estimator on every species file of every dataset, one row per (dataset, species file)."""
+    file_info_list = [(data_dir, file, count_col, estimators)
+                      for data_dir in data_dirs
+                      for file, count_col in files_of_interest.items()
+                      if os.path.exists(os.path.join(data_dir, file))
+                      or os.path.exists(typed_table_path(data_dir, file))]
+
+    results = [None] * len(file_info_list)
+    if max_workers == 1:
+        # in-process, so the per-file stages show up in a profile
+        for i, file_info in enumerate(file_info_list):
+            try:
+                results[i] = process_file(file_info)
+            except Exception as e:
+                print(f"Error processing {os.path.join(*file_info[:2])}: {e}")
+    else:
+        with span('estimators.pool', rows=len(file_info_list)), ProcessPoolExecutor(max_workers) as executor:
+            future_to_index = {executor.submit(process_file, file_info): i
+                               for i, file_info in enumerate(file_info_list)}
+            for future in as_completed(future_to_index):
+                i = future_to_index[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"Error processing {os.path.join(*file_info_list[i][:2])}: {e}")
+
+    columns = ['Dataset', 'File', 'S_obs', 'Q1', 'Q2'] + [name for name in ESTIMATORS if name in estimators]
+    return pd.DataFrame([row for row in results if row is not None], columns=columns)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the species richness estimators over species table folders.')
+    parser.add_argument('data_dirs', nargs='+', help='folders holding the species CSVs of one dataset each')
+    parser.add_argument('--estimators', nargs='+', default=list(ESTIMATORS), choices=ESTIMATORS)
+    parser.add_argument('--output', default='estimator_results.csv')
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--profile', default=None, metavar='PATH',
+                        help='write per-stage timings to PATH (JSON) and a Chrome trace next to it')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.profile:
+        enable_profiling(args.profile)
+    results_df = run_estimators(args.data_dirs, tuple(args.estimators), args.max_workers)
+    results_df.to_csv(args.output, index=False)
+
+    print(results_df)
+    print(f"Results saved to: {args.output}")
@@ -0,0 +1,40 @@
+import pandas as pd
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Specie Retreival Function'))
+
+from case_jackknife import CaseJackknife
+from log_cache import load_encoded_log
+from profiling import span
+from species_engine import case_species_incidence, duration_arrays, species_tasks
+
+input_csv = "/kaggle/input/final-dataset-thesis/dataset_csv/Sepsis.csv"
+
+log = load_encoded_log(input_csv)
+durations = duration_arrays(log)
+
+results = []
+
+for name, (kind, params) in species_tasks().items():
+    with span(f'jackknife.incidence.{name}', rows=len(log)):
+        cases, species, values, num_species = case_species_incidence(log, kind, params, durations)
+    with span(f'jackknife.leave_one_case_out.{name}', rows=log.num_cases):
+        jackknife = CaseJackknife(cases, species, values, log.num_cases, num_species).jackknife(
+            ('Jackknife_Order_1', 'Jackknife_Order_2'))
+
+    row = [name, jackknife['S_obs']['Estimate'], round(jackknife['S_obs']['Jackknife']),
+           jackknife['S_obs']['Std_Error']]
+    for estimator in ('Jackknife_Order_1', 'Jackknife_Order_2'):
+        row += [jackknife[estimator]['Estimate'], jackknife[estimator]['Std_Error']]
+    results.append(row)
+
+results_df = pd.DataFrame(results, columns=['Species', 'S_obs', 'Jackknife_Leave_One_Case_Out', 'Std_Error',
+                                            'Jackknife_Order_1', 'Jackknife_Order_1_Std_Error',
+                                            'Jackknife_Order_2', 'Jackknife_Order_2_Std_Error'])
+
+output_file = "/kaggle/working/jackknife_leave_one_case_out_Sepsis.csv"
+results_df.to_csv(output_file, index=False)
+
+print(results_df)
+print(f"Results saved to: {output_file}")
@@ -1,17 +1,7 @@
 import pandas as pd
 import os
 
-def jackknife_order_1(S_obs, Q1):
-    return S_obs + Q1
-
-def jackknife_order_2(S_obs, Q1, Q2):
-    return S_obs + 2 * Q1 - Q2
-
-def calculate_jackknife_from_dataframe(df, count_col):
-    S_obs = len(df)
-    Q1 = len(df[df[count_col] == 1])
-    Q2 = len(df[df[count_col] == 2])
-    return S_obs, Q1, Q2
+from species_estimators import AbundanceProfile, calculate_s_obs_q1_q2, jackknife_order_1, jackknife_order_2
 
 data_dir = "/kaggle/input/dear-lord-kill-me-now/Sepsis"
 
@@ -30,7 +20,7 @@ results = []
 for file, count_col in files_of_interest.items():
     file_path = os.path.join(data_dir, file)
     df = pd.read_csv(file_path)
-    S_obs, Q1, Q2 = calculate_jackknife_from_dataframe(df, count_col)
+    S_obs, Q1, Q2 = calculate_s_obs_q1_q2(AbundanceProfile.from_counts(df[count_col]))
 
     jackknife1 = jackknife_order_1(S_obs, Q1)
     jackknife2 = jackknife_order_2(S_obs, Q1, Q2)
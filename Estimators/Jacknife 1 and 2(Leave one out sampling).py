@@ -1,44 +1,17 @@
 import pandas as pd
-import numpy as np
 import os
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def jackknife_order_1(S_obs, Q1):
-    return S_obs + Q1
-
-def jackknife_order_2(S_obs, Q1, Q2):
-    return S_obs + 2 * Q1 - Q2
-
-def calculate_s_obs_q1_q2(df, count_col):
-    counts = df[count_col].values
-    S_obs = len(df)
-    Q1 = np.sum(counts == 1)
-    Q2 = np.sum(counts == 2)
-    return S_obs, Q1, Q2
-
-def jackknife_resampling(df, count_col):
-    counts = df[count_col].values
-    S_obs, Q1, Q2 = calculate_s_obs_q1_q2(df, count_col)
-
-    S_obs_resampled = S_obs - 1
-    Q1_resampled = Q1 - (counts == 1)
-    Q2_resampled = Q2 - (counts == 2)
-
-    jackknife1_estimates = S_obs_resampled + Q1_resampled
-    jackknife2_estimates = S_obs_resampled + 2 * Q1_resampled - Q2_resampled
-
-    jackknife1_estimate = np.mean(jackknife1_estimates)
-    jackknife2_estimate = np.mean(jackknife2_estimates)
-
-    return round(jackknife1_estimate), round(jackknife2_estimate)
+from species_estimators import AbundanceProfile, jackknife_resampling
 
 def process_file(file_info):
     file, count_col, data_dir = file_info
     file_path = os.path.join(data_dir, file)
     df = pd.read_csv(file_path)
 
-    jackknife1_resample, jackknife2_resample = jackknife_resampling(df, count_col)
-    S_obs, _, _ = calculate_s_obs_q1_q2(df, count_col)
+    profile = AbundanceProfile.from_counts(df[count_col])
+    jackknife1_resample, jackknife2_resample = jackknife_resampling(profile)
+    S_obs = profile.S_obs
 
     return [file, S_obs, jackknife1_resample, jackknife2_resample]
 
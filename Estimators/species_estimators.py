@@ -0,0 +1,222 @@
+import numpy as np
+
+
+class AbundanceProfile:
+    """Frequency-of-frequencies of a species table: ``frequencies[i]`` species were seen exactly ``abundances[i]`` times.
+
+    Only the distinct non-zero abundances are kept, so every estimator below runs in O(distinct counts).
+    """
+
+    def __init__(self, abundances, frequencies):
+        self.abundances = np.asarray(abundances, dtype=np.int64)
+        self.frequencies = np.asarray(frequencies, dtype=np.int64)
+        self.S_obs = int(self.frequencies.sum())
+        self.n = int(self.abundances @ self.frequencies)
+
+    @classmethod
+    def from_counts(cls, counts):
+        f = np.bincount(np.asarray(counts, dtype=np.int64))
+        abundances = np.flatnonzero(f[1:]) + 1
+        return cls(abundances, f[abundances])
+
+    @classmethod
+    def from_frequencies(cls, frequencies: dict):
+        abundances = np.array(sorted(k for k, f in frequencies.items() if k > 0 and f > 0), dtype=np.int64)
+        return cls(abundances, [frequencies[k] for k in abundances.tolist()])
+
+    def f(self, k) -> int:
+        i = np.searchsorted(self.abundances, k)
+        return int(self.frequencies[i]) if i < len(self.abundances) and self.abundances[i] == k else 0
+
+    @property
+    def Q1(self) -> int:
+        return self.f(1)
+
+    @property
+    def Q2(self) -> int:
+        return self.f(2)
+
+    def frequency_row(self, max_frequency=10) -> np.ndarray:
+        """Dense ``f_0..f_max_frequency`` followed by the number of species seen more often, see ``frequency_matrix``."""
+        row = np.zeros(max_frequency + 2, dtype=np.int64)
+        np.add.at(row, np.minimum(self.abundances, max_frequency + 1), self.frequencies)
+        return row
+
+    def rare(self, rare_threshold):
+        """Number of rare species and the sum of their counts."""
+        rare = self.abundances <= rare_threshold
+        return int(self.frequencies[rare].sum()), int(self.abundances[rare] @ self.frequencies[rare])
+
+
+def abundance_profile(counts) -> AbundanceProfile:
+    return counts if isinstance(counts, AbundanceProfile) else AbundanceProfile.from_counts(counts)
+
+
+def jackknife_order_1(S_obs, Q1):
+    return S_obs + Q1
+
+
+def jackknife_order_2(S_obs, Q1, Q2):
+    return S_obs + 2 * Q1 - Q2
+
+
+def calculate_s_obs_q1_q2(profile):
+    profile = abundance_profile(profile)
+    return profile.S_obs, profile.Q1, profile.Q2
+
+
+def jackknife_resampling(profile):
+    S_obs, Q1, Q2 = calculate_s_obs_q1_q2(profile)
+    if S_obs == 0:
+        return 0, 0
+
+    # leaving out one of the Q1 singletons (Q2 doubletons) lowers Q1 (Q2) by one, averaged over all S_obs species
+    jackknife1_estimate = (S_obs * (S_obs - 1 + Q1) - Q1) / S_obs
+    jackknife2_estimate = (S_obs * (S_obs - 1 + 2 * Q1 - Q2) - 2 * Q1 + Q2) / S_obs
+    return round(jackknife1_estimate), round(jackknife2_estimate)
+
+
+def ace_simplified(profile, rare_threshold):
+    profile = abundance_profile(profile)
+    S_obs = profile.S_obs
+    S_rare, n_rare = profile.rare(rare_threshold)
+    F1 = profile.Q1
+
+    C_ACE = 1 - (F1 / n_rare) if n_rare > 0 else 1
+    if C_ACE > 0:
+        S_ACE = (S_rare / C_ACE) + (S_obs - S_rare)
+    else:
+        S_ACE = S_obs
+    return round(max(S_ACE, S_obs))
+
+
+def ace_traditional(profile, rare_threshold=5, max_frequency=10):
+    profile = abundance_profile(profile)
+    S_obs = profile.S_obs
+    S_rare, n_rare = profile.rare(rare_threshold)
+    F1 = profile.Q1
+
+    C_ACE = 1 - (F1 / n_rare) if n_rare > 0 else 0
+    if C_ACE <= 0:
+        return round(S_obs)
+
+    i = profile.abundances[profile.abundances <= max_frequency]
+    sum_i_i_minus_1_Fi = int(i * (i - 1) @ profile.frequencies[:len(i)])
+    if n_rare > 1:
+        gamma_sq_ACE = (S_rare / C_ACE) * (sum_i_i_minus_1_Fi / (n_rare * (n_rare - 1)))
+    else:
+        gamma_sq_ACE = 0
+    return round(S_rare + (F1 / C_ACE) * gamma_sq_ACE)
+
+
+ESTIMATORS = ('Jackknife_Order_1', 'Jackknife_Order_2', 'Jackknife_Order_1_Resampling',
+              'Jackknife_Order_2_Resampling', 'ACE-5_Simplified', 'ACE-10_Simplified', 'ACE_Rare5_Traditional')
+
+
+def estimate_species(counts, estimators=ESTIMATORS) -> dict:
+    profile = abundance_profile(counts)
+    S_obs, Q1, Q2 = calculate_s_obs_q1_q2(profile)
+    results = {'S_obs': S_obs, 'Q1': Q1, 'Q2': Q2}
+    if 'Jackknife_Order_1' in estimators:
+        results['Jackknife_Order_1'] = round(jackknife_order_1(S_obs, Q1))
+    if 'Jackknife_Order_2' in estimators:
+        results['Jackknife_Order_2'] = round(jackknife_order_2(S_obs, Q1, Q2))
+    if 'Jackknife_Order_1_Resampling' in estimators or 'Jackknife_Order_2_Resampling' in estimators:
+        jackknife1, jackknife2 = jackknife_resampling(profile)
+        if 'Jackknife_Order_1_Resampling' in estimators:
+            results['Jackknife_Order_1_Resampling'] = jackknife1
+        if 'Jackknife_Order_2_Resampling' in estimators:
+            results['Jackknife_Order_2_Resampling'] = jackknife2
+    if 'ACE-5_Simplified' in estimators:
+        results['ACE-5_Simplified'] = ace_simplified(profile, rare_threshold=5)
+    if 'ACE-10_Simplified' in estimators:
+        results['ACE-10_Simplified'] = ace_simplified(profile, rare_threshold=10)
+    if 'ACE_Rare5_Traditional' in estimators:
+        results['ACE_Rare5_Traditional'] = ace_traditional(profile)
+    return results
+
+
+def frequency_matrix(abundances, max_frequency=10) -> np.ndarray:
+    """f_k profiles of a replicates x species abundance matrix with a single bincount.
+
+    Column ``k`` counts the species seen exactly ``k`` times for ``k <= max_frequency``; the last column counts the
+    species seen more often, which is all the estimators need as long as their thresholds stay within
+    ``max_frequency``. Column 0 (unseen species) is ignored by the estimators.
+    """
+    abundances = np.minimum(np.asarray(abundances, dtype=np.int64), max_frequency + 1)
+    width = max_frequency + 2
+    offsets = np.arange(len(abundances), dtype=np.int64)[:, np.newaxis] * width
+    return np.bincount((abundances + offsets).ravel(), minlength=len(abundances) * width).reshape(-1, width)
+
+
+def _checked_frequencies(F, max_frequency):
+    F = np.asarray(F, dtype=np.int64)
+    if max_frequency > F.shape[1] - 2:
+        raise ValueError(f'frequency {max_frequency} exceeds the {F.shape[1] - 2} frequencies of the profiles')
+    return F
+
+
+def _rare_species(F, rare_threshold):
+    k = np.arange(1, rare_threshold + 1)
+    return F[:, 1:rare_threshold + 1].sum(axis=1), F[:, 1:rare_threshold + 1] @ k
+
+
+def batch_s_obs_q1_q2(F):
+    F = np.asarray(F, dtype=np.int64)
+    return F[:, 1:].sum(axis=1), F[:, 1], F[:, 2]
+
+
+def batch_jackknife_resampling(F):
+    S_obs, Q1, Q2 = batch_s_obs_q1_q2(F)
+    divisor = np.maximum(S_obs, 1)
+    jackknife1_estimate = (S_obs * (S_obs - 1 + Q1) - Q1) / divisor
+    jackknife2_estimate = (S_obs * (S_obs - 1 + 2 * Q1 - Q2) - 2 * Q1 + Q2) / divisor
+    return np.round(jackknife1_estimate).astype(np.int64), np.round(jackknife2_estimate).astype(np.int64)
+
+
+def batch_ace_simplified(F, rare_threshold):
+    F = _checked_frequencies(F, rare_threshold)
+    S_obs = F[:, 1:].sum(axis=1)
+    S_rare, n_rare = _rare_species(F, rare_threshold)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        C_ACE = np.where(n_rare > 0, 1 - F[:, 1] / n_rare, 1)
+        S_ACE = np.where(C_ACE > 0, (S_rare / C_ACE) + (S_obs - S_rare), S_obs)
+    return np.round(np.maximum(S_ACE, S_obs)).astype(np.int64)
+
+
+def batch_ace_traditional(F, rare_threshold=5, max_frequency=10):
+    F = _checked_frequencies(F, max(rare_threshold, max_frequency))
+    S_obs = F[:, 1:].sum(axis=1)
+    S_rare, n_rare = _rare_species(F, rare_threshold)
+    F1 = F[:, 1]
+
+    i = np.arange(1, max_frequency + 1)
+    sum_i_i_minus_1_Fi = F[:, 1:max_frequency + 1] @ (i * (i - 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        C_ACE = np.where(n_rare > 0, 1 - F1 / n_rare, 0)
+        gamma_sq_ACE = np.where(n_rare > 1, (S_rare / C_ACE) * (sum_i_i_minus_1_Fi / (n_rare * (n_rare - 1))), 0)
+        S_ACE = np.where(C_ACE > 0, S_rare + (F1 / C_ACE) * gamma_sq_ACE, S_obs)
+    return np.round(S_ACE).astype(np.int64)
+
+
+def estimate_species_batch(F, estimators=ESTIMATORS) -> dict:
+    """``estimate_species`` for every row of a ``frequency_matrix`` at once, one array per estimator."""
+    S_obs, Q1, Q2 = batch_s_obs_q1_q2(F)
+    results = {'S_obs': S_obs, 'Q1': Q1, 'Q2': Q2}
+    if 'Jackknife_Order_1' in estimators:
+        results['Jackknife_Order_1'] = jackknife_order_1(S_obs, Q1)
+    if 'Jackknife_Order_2' in estimators:
+        results['Jackknife_Order_2'] = jackknife_order_2(S_obs, Q1, Q2)
+    if 'Jackknife_Order_1_Resampling' in estimators or 'Jackknife_Order_2_Resampling' in estimators:
+        jackknife1, jackknife2 = batch_jackknife_resampling(F)
+        if 'Jackknife_Order_1_Resampling' in estimators:
+            results['Jackknife_Order_1_Resampling'] = jackknife1
+        if 'Jackknife_Order_2_Resampling' in estimators:
+            results['Jackknife_Order_2_Resampling'] = jackknife2
+    if 'ACE-5_Simplified' in estimators:
+        results['ACE-5_Simplified'] = batch_ace_simplified(F, rare_threshold=5)
+    if 'ACE-10_Simplified' in estimators:
+        results['ACE-10_Simplified'] = batch_ace_simplified(F, rare_threshold=10)
+    if 'ACE_Rare5_Traditional' in estimators:
+        results['ACE_Rare5_Traditional'] = batch_ace_traditional(F)
+    return results
@@ -10,7 +10,9 @@ EVENT_ID_KEY = 'concept:instance'
 
 import pandas as pd
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
+
+from species_cache import cached_species
+from species_engine import compute_species_in_parallel, species_tasks, variant_species_table
 
 def has_lifecycle_info(df):
     return (LIFECYCLE in df.columns) and df[LIFECYCLE].nunique() > 1
@@ -48,12 +50,6 @@ def convert_to_duration_log(df):
     else:
         return log_to_durationlog(df)
 
-def compute_species_in_parallel(df, func, *args):
-    with ThreadPoolExecutor() as executor:
-        future = executor.submit(func, df, *args)
-        result = future.result()
-    return result
-
 def activity_based_species(df):
     unique_activities = df[ACTIVITY_ID_KEY].value_counts().reset_index(name='count')
     unique_activities.columns = ['species', 'count']
@@ -78,8 +74,13 @@ def directly_follows_species(df, respect_lifecycle=True, include_startend=True):
     return counts, counts.shape[0]
 
 def trace_variant_based_species(df):
-    trace_variants = df.groupby(CASE_ID_KEY)[ACTIVITY_ID_KEY].apply(lambda x: ','.join(x)).value_counts().reset_index(name='count')
-    trace_variants.columns = ['species', 'count']
+    # events without a case or activity never form a species, as in encode_log
+    df = df[df[CASE_ID_KEY].notna() & df[ACTIVITY_ID_KEY].notna()]
+    case_codes, cases = pd.factorize(df[CASE_ID_KEY], sort=True)
+    activity_codes, activities = pd.factorize(df[ACTIVITY_ID_KEY])
+    order = np.argsort(case_codes, kind='stable')
+    case_offsets = np.searchsorted(case_codes[order], np.arange(len(cases) + 1))
+    trace_variants = variant_species_table(activity_codes[order], case_offsets, activities)
     return trace_variants, len(trace_variants)
 
 def calculate_Q1_Q2(counts):
@@ -88,35 +89,42 @@ def calculate_Q1_Q2(counts):
     Q2 = frequency_counts.get(2, 0)
     return Q1, Q2
 
-df = pd.read_csv('/kaggle/input/bpi-2019-sample-grouped/BPI-2019_grouped_sample_50 (1).csv')
-
-df['time:timestamp'] = pd.to_datetime(df['time:timestamp'], format='ISO8601', errors='coerce')
+if __name__ == "__main__":
+    input_csv = '/kaggle/input/bpi-2019-sample-grouped/BPI-2019_grouped_sample_50 (1).csv'
+    respect_lifecycle = True
+    include_startend = True
 
-df_sorted = df.sort_values(by=[CASE_ID_KEY, TIMESTAMP])
+    tasks = species_tasks(uniform_lambdas=(), exponential_lambda=None, respect_lifecycle=respect_lifecycle,
+                          include_startend=include_startend)
+    seconds = {}
 
-df_sorted[DURATION_KEY] = df_sorted.groupby(CASE_ID_KEY)[TIMESTAMP].diff().dt.total_seconds().fillna(0)
+    def compute_in_parallel(log, missing):
+        results = compute_species_in_parallel(log, missing)
+        seconds.update((name, result[4]) for name, result in results.items())
+        return {name: result[0] for name, result in results.items()}
 
-activity_species, activity_count = compute_species_in_parallel(df_sorted, activity_based_species)
-Q1_act, Q2_act = compute_species_in_parallel(activity_species, calculate_Q1_Q2)
+    tables = cached_species(input_csv, tasks, compute=compute_in_parallel)
+    results = {name: (table, len(table), *calculate_Q1_Q2(table)) for name, table in tables.items()}
 
-directly_follows_result, directly_follows_count = compute_species_in_parallel(df_sorted, directly_follows_species)
-Q1_df, Q2_df = compute_species_in_parallel(directly_follows_result, calculate_Q1_Q2)
+    activity_species, activity_count, Q1_act, Q2_act = results['activity_species']
+    directly_follows_result, directly_follows_count, Q1_df, Q2_df = results['directly_follows_species']
+    trace_variant_species, trace_variant_count, Q1_tv, Q2_tv = results['trace_variant_species']
 
-trace_variant_species, trace_variant_count = compute_species_in_parallel(df_sorted, trace_variant_based_species)
-Q1_tv, Q2_tv = compute_species_in_parallel(trace_variant_species, calculate_Q1_Q2)
+    activity_species.to_csv('/kaggle/working/50R_activity_species_BPI-2019.csv', index=False)
+    directly_follows_result.to_csv('/kaggle/working/50R_directly_follows_species_BPI-2019.csv', index=False)
+    trace_variant_species.to_csv('/kaggle/working/50R_trace_variant_species_BPI-2019.csv', index=False)
 
-activity_species.to_csv('/kaggle/working/50R_activity_species_BPI-2019.csv', index=False)
-directly_follows_result.to_csv('/kaggle/working/50R_directly_follows_species_BPI-2019.csv', index=False)
-trace_variant_species.to_csv('/kaggle/working/50R_trace_variant_species_BPI-2019.csv', index=False)
+    for name in tasks:
+        print(f"{name}: {seconds[name]:.2f}s" if name in seconds else f"{name}: cached")
 
-print(f"Activity-based Species (ζact): {activity_count} species found")
-print(f"Q1 (Singletons) for ζact: {Q1_act}")
-print(f"Q2 (Doubletons) for ζact: {Q2_act}")
+    print(f"Activity-based Species (ζact): {activity_count} species found")
+    print(f"Q1 (Singletons) for ζact: {Q1_act}")
+    print(f"Q2 (Doubletons) for ζact: {Q2_act}")
 
-print(f"Directly-Follows Relation-based Species (ζdf): {directly_follows_count} species found")
-print(f"Q1 (Singletons) for ζdf: {Q1_df}")
-print(f"Q2 (Doubletons) for ζdf: {Q2_df}")
+    print(f"Directly-Follows Relation-based Species (ζdf): {directly_follows_count} species found")
+    print(f"Q1 (Singletons) for ζdf: {Q1_df}")
+    print(f"Q2 (Doubletons) for ζdf: {Q2_df}")
 
-print(f"Trace Variant-based Species (ζtv): {trace_variant_count} species found")
-print(f"Q1 (Singletons) for ζtv: {Q1_tv}")
-print(f"Q2 (Doubletons) for ζtv: {Q2_tv}")
+    print(f"Trace Variant-based Species (ζtv): {trace_variant_count} species found")
+    print(f"Q1 (Singletons) for ζtv: {Q1_tv}")
+    print(f"Q2 (Doubletons) for ζtv: {Q2_tv}")
@@ -0,0 +1,48 @@
+from log_cache import load_encoded_log
+from partitioned_species import partitioned_species
+from profiling import span
+from species_engine import calculate_Q1_Q2, compute_all_species, save_species_tables, species_tasks
+from species_store import save_species_store
+from streaming_species import stream_species
+from xes_import import is_xes, stream_xes_species
+
+SPECIES_LABELS = {
+    'activity_species': 'Activity-based Species (ζact)',
+    'directly_follows_species': 'Directly-Follows Relation-based Species (ζdf)',
+    'trace_variant_species': 'Trace Variant-based Species (ζtv)',
+    'uniform_duration_species_zt1': 'Uniform Duration-based Species ζt1',
+    'uniform_duration_species_zt5': 'Uniform Duration-based Species ζt5',
+    'uniform_duration_species_zt30': 'Uniform Duration-based Species ζt30',
+    'exponential_duration_species_zte2': 'Exponential Duration-based Species ζte2',
+}
+
+
+def main(input_csv, output_dir, chunksize=None, typed_tables=False, memory_budget=None, k_grams=()):
+    if memory_budget is not None:
+        if is_xes(input_csv):
+            raise ValueError(f'{input_csv}: the memory-budgeted mode reads CSV logs only; '
+                             f'pass chunksize to stream an XES log instead')
+        tables = partitioned_species(input_csv, memory_budget, species_tasks(k_grams=k_grams))
+    elif chunksize is None:
+        tables = compute_all_species(load_encoded_log(input_csv), k_grams=k_grams)
+    elif is_xes(input_csv):
+        tables = stream_xes_species(input_csv, chunksize, k_grams=k_grams)
+    else:
+        tables = stream_species(input_csv, chunksize, k_grams=k_grams)
+    with span('species.save', rows=len(tables)):
+        save_species_tables(tables, output_dir)
+        if typed_tables:
+            save_species_store(tables, output_dir)
+
+    for name, table in tables.items():
+        Q1, Q2 = calculate_Q1_Q2(table)
+        label = SPECIES_LABELS.get(name, name)
+        print(f"{label}: {len(table)} species found")
+        print(f"Q1 (Singletons): {Q1}")
+        print(f"Q2 (Doubletons): {Q2}")
+
+
+if __name__ == "__main__":
+    input_csv = "/kaggle/input/bpi-2019-grouped-sample/BPI-2019_grouped_sample_50 (1).csv"
+    output_dir = "/kaggle/working/"
+    main(input_csv, output_dir)
@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy as np
 from pandas import Series, DataFrame, Timedelta
-import time
+
+from log_cache import load_event_log
+from species_cache import cached_species
+from species_engine import classify_durations, sortable_timestamps, species_tasks, to_nanoseconds, \
+    uniform_species_key
 
 CASE_ID_KEY = 'case:concept:name'
 ACTIVITY_ID_KEY = 'concept:name'
@@ -14,74 +18,81 @@ UNTIL_KEY = 'time:until'
 def has_lifecycle_info(log: DataFrame) -> bool:
     return (LIFECYCLE in log.columns) and log[LIFECYCLE].unique().shape[0] > 1
 
-def log_to_durationlog(log: DataFrame) -> DataFrame:
-    if LIFECYCLE in log.columns:
-        log = log[log[LIFECYCLE].str.lower() == "complete"]
-    sort_columns = [CASE_ID_KEY, TIMESTAMP]
-    df: DataFrame = log.sort_values(sort_columns).reset_index()
-
-    aux_case = 'aux_case_' + str(time.time())
-    aux_timestamp = 'aux_time_' + str(time.time())
-
-    df[aux_case] = df[CASE_ID_KEY].shift(1)
-    df[aux_timestamp] = df[TIMESTAMP].shift(1)
-
-    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP])
-    df[aux_timestamp] = pd.to_datetime(df[aux_timestamp])
-
-    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], format='ISO8601')
-    df[aux_timestamp] = pd.to_datetime(df[aux_timestamp], format='ISO8601')
-
-    at_border = ~(df[aux_case] == df[CASE_ID_KEY])
-    df.loc[~at_border, FROM_KEY] = df[~at_border][aux_timestamp]
-    df.loc[at_border, FROM_KEY] = df[at_border][TIMESTAMP]
+def parse_timestamps(timestamps: Series) -> Series:
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps
+    return pd.to_datetime(timestamps, format='ISO8601')
+
+def lifecycle_positions(log: DataFrame, *transitions) -> tuple:
+    codes, values = pd.factorize(log[LIFECYCLE])
+    lowered = np.asarray(pd.Index(values).astype(str).str.lower(), dtype=object)
+    keep = np.flatnonzero(np.isin(codes, np.flatnonzero(np.isin(lowered, transitions))))
+    return keep, lowered[codes[keep]]
+
+def with_durations(log: DataFrame, positions: np.ndarray, timestamps: Series, rows: np.ndarray,
+                   from_rows: np.ndarray) -> DataFrame:
+    timestamps = timestamps.array
+    df: DataFrame = log.take(positions[rows]).reset_index(drop=True)
+    df[TIMESTAMP] = timestamps.take(rows)
+    df[FROM_KEY] = timestamps.take(from_rows)
     df[UNTIL_KEY] = df[TIMESTAMP]
+    df[DURATION_KEY] = df[UNTIL_KEY] - df[FROM_KEY]
+    return df
 
-    df = df.drop([aux_case, aux_timestamp], axis=1)
+def log_to_durationlog(log: DataFrame) -> DataFrame:
+    if LIFECYCLE in log.columns:
+        positions, _ = lifecycle_positions(log, "complete")
+    else:
+        positions = np.arange(len(log))
+    timestamps = parse_timestamps(log[TIMESTAMP].take(positions))
+    case_codes, _ = pd.factorize(log[CASE_ID_KEY].take(positions), sort=True)
 
-    df[FROM_KEY] = pd.to_datetime(df[FROM_KEY])
-    df[UNTIL_KEY] = pd.to_datetime(df[UNTIL_KEY])
-    df[DURATION_KEY] = df[UNTIL_KEY] - df[FROM_KEY]
+    rows = np.lexsort((sortable_timestamps(to_nanoseconds(timestamps)), case_codes))
+    cases = case_codes[rows]
+    at_border = np.r_[True, cases[1:] != cases[:-1]]
+    from_rows = np.where(at_border, rows, np.r_[rows[:1], rows[:-1]])
 
-    return df
+    return with_durations(log, positions, timestamps, rows, from_rows)
 
 def lclog_to_durationlog(log: DataFrame) -> DataFrame:
-    with_id = ('concept:instance' in log.columns)
-    log = log[(log[LIFECYCLE].str.lower() == "start") | (log[LIFECYCLE].str.lower() == "complete")]
-    sort_columns = [CASE_ID_KEY, ACTIVITY_ID_KEY]
-    if with_id:
-        sort_columns += ['concept:instance']
-    sort_columns += [TIMESTAMP]
-    df: DataFrame = log.sort_values(sort_columns).reset_index()
-
-    aux_act = 'aux_act_' + str(time.time())
-    aux_case = 'aux_case_' + str(time.time())
-    aux_timestamp = 'aux_time_' + str(time.time())
-    aux_lifecycle = 'aux_lc_' + str(time.time())
-
-    df[aux_act] = df[ACTIVITY_ID_KEY].shift(1, fill_value=df.at[0, ACTIVITY_ID_KEY])
-    df[aux_case] = df[CASE_ID_KEY].shift(1, fill_value=df.at[0, CASE_ID_KEY])
-    df[aux_timestamp] = df[TIMESTAMP].shift(1, fill_value=df.at[0, TIMESTAMP])
-    df[aux_lifecycle] = df[LIFECYCLE].shift(1, fill_value=df.at[0, LIFECYCLE])
-
-    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], format='ISO8601')
-    df[aux_timestamp] = pd.to_datetime(df[aux_timestamp], format='ISO8601')
-
-    df = df[df[LIFECYCLE].str.lower() == 'complete']
-    with_start = (~(df[aux_lifecycle].str.lower() == 'complete')
-                  & (df[aux_case] == df[CASE_ID_KEY])
-                  & (df[aux_act] == df[ACTIVITY_ID_KEY]))
-    df.loc[with_start, FROM_KEY] = df[with_start][aux_timestamp]
-    df.loc[~with_start, FROM_KEY] = df[~with_start][TIMESTAMP]
-    df[UNTIL_KEY] = df[TIMESTAMP]
+    positions, lifecycle = lifecycle_positions(log, "start", "complete")
+    complete = lifecycle == "complete"
+    timestamps = parse_timestamps(log[TIMESTAMP].take(positions))
+
+    sort_keys = [sortable_timestamps(to_nanoseconds(timestamps))]
+    if 'concept:instance' in log.columns:
+        instance_codes, _ = pd.factorize(log['concept:instance'].take(positions), sort=True)
+        sort_keys.append(np.where(instance_codes < 0, len(instance_codes), instance_codes))
+    activity_codes, _ = pd.factorize(log[ACTIVITY_ID_KEY].take(positions), sort=True)
+    case_codes, _ = pd.factorize(log[CASE_ID_KEY].take(positions), sort=True)
+    order = np.lexsort(sort_keys + [activity_codes, case_codes])
+
+    cases, activities, complete = case_codes[order], activity_codes[order], complete[order]
+    with_start = np.zeros(len(order), dtype=bool)
+    with_start[1:] = ~complete[:-1] & (cases[1:] == cases[:-1]) & (activities[1:] == activities[:-1])
+    from_rows = np.where(with_start, np.r_[order[:1], order[:-1]], order)
+
+    return with_durations(log, positions, timestamps, order[complete], from_rows[complete])
+
+class MultiResolutionOneGramBag:
+    def __init__(self, intervals):
+        self._intervals = [(interval, exponential) for interval, exponential in intervals]
+
+    def classify(self, sample: DataFrame) -> list:
+        if not (DURATION_KEY in sample.columns):
+            if has_lifecycle_info(sample):
+                sample = lclog_to_durationlog(sample)
+            else:
+                sample = log_to_durationlog(sample)
 
-    df = df.drop([aux_act, aux_timestamp, aux_case, aux_lifecycle], axis=1)
+        sample = sample[sample[CASE_ID_KEY].notna() & sample[ACTIVITY_ID_KEY].notna()]
+        case_codes, cases = pd.factorize(sample[CASE_ID_KEY], sort=True)
+        activity_codes, activities = pd.factorize(sample[ACTIVITY_ID_KEY], sort=True)
+        durations = pd.to_timedelta(sample[DURATION_KEY]).to_numpy(dtype='m8[ns]').view(np.int64)
 
-    df[FROM_KEY] = pd.to_datetime(df[FROM_KEY])
-    df[UNTIL_KEY] = pd.to_datetime(df[UNTIL_KEY])
-    df[DURATION_KEY] = df[UNTIL_KEY] - df[FROM_KEY]
+        return classify_durations((case_codes, activity_codes, durations), len(cases),
+                                  np.asarray(activities, dtype=object), self._intervals)
 
-    return df
 
 class TimedOneGramBag:
     def __init__(self, interval: Timedelta, exponential: bool = False):
@@ -89,36 +100,10 @@ class TimedOneGramBag:
         self._exponential = exponential
 
     def classify(self, sample: DataFrame) -> Series:
-        duration_factor = 'factor_column_' + str(time.time())
-        duration_bag = 'bag_column_' + str(time.time())
-        count = 'count_column_' + str(time.time())
-
-        if not (DURATION_KEY in sample.columns):
-            if has_lifecycle_info(sample):
-                sample = lclog_to_durationlog(sample)
-            else:
-                sample = log_to_durationlog(sample)
-
-        sample[duration_factor] = sample[DURATION_KEY] / self._interval
-        if self._exponential:
-            np.seterr(divide='ignore')
-            sample[duration_bag] = np.ceil(np.log2(sample[duration_factor]))
-            np.seterr(divide='warn')
-            sample.loc[(sample[duration_bag] < 0) & ~(sample[duration_bag] == -np.inf), duration_bag] = 0
-        else:
-            sample[duration_bag] = np.ceil(sample[duration_factor])
-
-        df: DataFrame = sample.groupby([CASE_ID_KEY, ACTIVITY_ID_KEY, duration_bag]).size() \
-            .reset_index() \
-            .rename(columns={0: count})
-        df[count] = 1
-
-        s = df.groupby([ACTIVITY_ID_KEY, duration_bag]).sum(numeric_only=True).squeeze(axis='columns')
-        s.index = s.index.to_flat_index()
-        return s
+        return MultiResolutionOneGramBag([(self._interval, self._exponential)]).classify(sample)[0]
 
 def load_data(csv_file_path):
-    df = pd.read_csv(csv_file_path)
+    df = load_event_log(csv_file_path)
     return df
 
 def convert_to_duration_log(df):
@@ -148,19 +133,27 @@ def save_species_to_csv(species, file_name):
 
     species_df.to_csv(file_name, index=False)
 
-def main(input_csv):
-    event_log = load_data(input_csv)
-    duration_log = convert_to_duration_log(event_log)
+def classify_species(duration_log, uniform_lambdas, exponential_lambdas):
+    intervals = [(pd.Timedelta(minutes=lambda_value), False) for lambda_value in uniform_lambdas]
+    intervals += [(pd.Timedelta(minutes=lambda_value), True) for lambda_value in exponential_lambdas]
+    species = MultiResolutionOneGramBag(intervals).classify(duration_log)
+    return species[:len(uniform_lambdas)], species[len(uniform_lambdas):]
+
+def main(input_csv, lambda_values=(1, 5, 30), exponential_lambda_value=1.5, cache=None):
+    tasks = {name: task for name, task in species_tasks(lambda_values, exponential_lambda_value).items()
+             if task[0] in ('uniform_duration', 'exponential_duration')}
+    tables = cached_species(input_csv, tasks, cache)
 
-    lambda_values = [1, 5, 30]
     for lambda_value in lambda_values:
-        species = classify_uniform_species(duration_log, lambda_value)
+        name = uniform_species_key(lambda_value)
+        species = tables[name]
         num_species = len(species)
-        print(f"Uniform Duration-based Species ζt{lambda_value}: {num_species} species found")
-        save_species_to_csv(species, f'uniform_duration_species_zt{lambda_value}.csv')
+        print(f"Uniform Duration-based Species ζt{name.rpartition('_zt')[2]}: {num_species} species found")
+        save_species_to_csv(species, f'{name}.csv')
 
-    lambda_value = 1.5
-    exp_species = classify_exponential_species(duration_log, lambda_value)
+    if exponential_lambda_value is None:
+        return
+    exp_species = tables['exponential_duration_species_zte2']
     num_exp_species = len(exp_species)
     print(f"Exponential Duration-based Species ζte2: {num_exp_species} species found")
     save_species_to_csv(exp_species, 'exponential_duration_species_zte2.csv')
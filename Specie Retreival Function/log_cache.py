@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from profiling import span
+from species_engine import EncodedLog, encode_log
+from xes_import import is_xes, read_xes
+
+CACHE_DIR = os.environ.get('EVENT_LOG_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'event_log_cache'))
+CACHE_FORMAT = 1
+
+CODE_COLUMNS = ('case_codes', 'activity_codes', 'timestamps', 'lifecycle_codes', 'instance_codes')
+LABEL_COLUMNS = ('cases', 'activities', 'lifecycles', 'instances')
+
+
+def file_digest(path, block_size=1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(csv_path, cache_dir=CACHE_DIR) -> str:
+    return os.path.join(cache_dir, file_digest(csv_path))
+
+
+def write_encoded_log(log: EncodedLog, path):
+    """Stores the encoded log as one .npy file per integer column plus a JSON label dictionary."""
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+    labels = {'format': CACHE_FORMAT}
+    for column in CODE_COLUMNS:
+        values = getattr(log, column)
+        if values is not None:
+            np.save(os.path.join(staging, f'{column}.npy'), values)
+    for column in LABEL_COLUMNS:
+        values = getattr(log, column)
+        labels[column] = None if values is None else pd.Index(values).tolist()
+    with open(os.path.join(staging, 'labels.json'), 'w', encoding='utf-8') as f:
+        json.dump(labels, f)
+    try:
+        os.replace(staging, path)
+    except OSError:
+        # another run cached the same file first
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def read_encoded_log(path, mmap_mode='r') -> EncodedLog:
+    with open(os.path.join(path, 'labels.json'), encoding='utf-8') as f:
+        labels = json.load(f)
+    if labels.get('format') != CACHE_FORMAT:
+        raise ValueError(f'unsupported event log cache format in {path}')
+    arrays = {}
+    for column in CODE_COLUMNS:
+        file = os.path.join(path, f'{column}.npy')
+        arrays[column] = np.load(file, mmap_mode=mmap_mode) if os.path.exists(file) else None
+    return EncodedLog(arrays['case_codes'], arrays['activity_codes'], arrays['timestamps'],
+                      np.asarray(labels['cases'], dtype=object), np.asarray(labels['activities'], dtype=object),
+                      arrays['lifecycle_codes'], None if labels['lifecycles'] is None else pd.Index(labels['lifecycles']),
+                      arrays['instance_codes'], labels['instances'])
+
+
+def load_encoded_log(csv_path, cache_dir=CACHE_DIR, mmap_mode='r', digest=None) -> EncodedLog:
+    path = os.path.join(cache_dir, digest) if digest is not None else cache_path(csv_path, cache_dir)
+    if not os.path.exists(os.path.join(path, 'labels.json')):
+        if is_xes(csv_path):
+            log = read_xes(csv_path)
+        else:
+            with span('log.read_csv') as read:
+                frame = pd.read_csv(csv_path)
+                read.rows = len(frame)
+            log = encode_log(frame)
+            del frame
+        with span('log_cache.write', rows=len(log)):
+            write_encoded_log(log, path)
+    with span('log_cache.read') as read:
+        log = read_encoded_log(path, mmap_mode)
+        read.rows = len(log)
+    return log
+
+
+def load_event_log(csv_path, cache_dir=CACHE_DIR, categorical=False) -> pd.DataFrame:
+    return load_encoded_log(csv_path, cache_dir).to_frame(categorical)
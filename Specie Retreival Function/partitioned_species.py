@@ -0,0 +1,130 @@
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from profiling import span
+from species_engine import CASE_ID_KEY, LIFECYCLE, compute_species_tasks, encode_log, species_tasks
+from streaming_species import CHUNK_SIZE, log_columns
+
+# rough peak bytes of encoding a log and extracting all species per byte of its CSV
+MEMORY_PER_CSV_BYTE = 6
+
+
+def partition_count(csv_path, memory_budget) -> int:
+    return max(1, math.ceil(os.path.getsize(csv_path) * MEMORY_PER_CSV_BYTE / memory_budget))
+
+
+def hash_partitions(frame: DataFrame, num_partitions) -> np.ndarray:
+    return (pd.util.hash_pandas_object(frame, index=False).to_numpy() % np.uint64(num_partitions)).astype(np.int64)
+
+
+def key_columns(kind) -> list:
+    if kind in ('uniform_duration', 'exponential_duration'):
+        return ['species', 'bin']
+    if kind == 'directly_follows':
+        return ['species', 'next_species']
+    return ['species']
+
+
+def species_frame(kind, table) -> DataFrame:
+    if kind in ('uniform_duration', 'exponential_duration'):
+        activities, bins = zip(*table.index) if len(table) else ((), ())
+        return DataFrame({'species': list(activities), 'bin': np.asarray(bins, dtype=np.float64),
+                          'count': table.to_numpy()})
+    return table[key_columns(kind) + ['count']]
+
+
+def to_species_layout(kind, merged: DataFrame):
+    """Restores the table layout ``compute_species`` returns from merged key/count rows."""
+    if kind in ('uniform_duration', 'exponential_duration'):
+        merged = merged.sort_values(['species', 'bin'], kind='stable')
+        keys = zip(merged['species'], merged['bin'].tolist())
+        return Series(merged['count'].to_numpy(), index=pd.Index(list(keys), tupleize_cols=False), name='count')
+    if kind == 'directly_follows':
+        return merged.sort_values(['species', 'next_species'], ignore_index=True)
+    if kind == 'k_gram':
+        return merged.sort_values('species', ignore_index=True)
+    merged = merged.sort_values('species', kind='stable')
+    return merged.sort_values('count', ascending=False, kind='stable', ignore_index=True)
+
+
+def spill(frame: DataFrame, directory, file_name):
+    os.makedirs(directory, exist_ok=True)
+    frame.to_pickle(os.path.join(directory, file_name))
+
+
+def read_spilled(directory) -> DataFrame:
+    files = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    frames = [pd.read_pickle(os.path.join(directory, file)) for file in files]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def spill_case_partitions(csv_path, num_partitions, spill_dir, chunksize=CHUNK_SIZE):
+    """Hash-partitions the log by case id into ``spill_dir/cases-<p>``; returns the lifecycle values seen."""
+    lifecycles = {}
+    chunks = pd.read_csv(csv_path, usecols=log_columns(csv_path), dtype={CASE_ID_KEY: str}, chunksize=chunksize)
+    for i, chunk in enumerate(chunks):
+        if LIFECYCLE in chunk.columns:
+            lifecycles.update(dict.fromkeys(chunk[LIFECYCLE].dropna().unique()))
+        partitions = hash_partitions(chunk[[CASE_ID_KEY]], num_partitions)
+        for partition in np.unique(partitions):
+            spill(chunk[partitions == partition], os.path.join(spill_dir, f'cases-{partition}'), f'{i:08d}.pkl')
+    return list(lifecycles) if lifecycles else None
+
+
+def partitioned_species(csv_path, memory_budget, tasks=None, spill_dir=None, chunksize=CHUNK_SIZE) -> dict:
+    """Species tables of a log too large to extract in memory.
+
+    The log is hash-partitioned by case id so every partition holds whole cases and fits the
+    budget; each partition's species counts are hash-partitioned again by species key and
+    spilled, and every species key partition is merged by summing, since all species counts
+    are sums over cases.
+    """
+    if tasks is None:
+        tasks = species_tasks()
+    num_partitions = partition_count(csv_path, memory_budget)
+    spill_dir = tempfile.mkdtemp(prefix='species-spill-', dir=spill_dir)
+    try:
+        with span('partitioned.spill_cases', partitions=num_partitions):
+            lifecycles = spill_case_partitions(csv_path, num_partitions, spill_dir, chunksize)
+        for partition in range(num_partitions):
+            case_dir = os.path.join(spill_dir, f'cases-{partition}')
+            with span('partitioned.read_cases') as read:
+                cases = read_spilled(case_dir)
+                read.rows = None if cases is None else len(cases)
+            if cases is None:
+                continue
+            tables = compute_species_tasks(encode_log(cases, lifecycles=lifecycles), tasks)
+            del cases
+            shutil.rmtree(case_dir)
+            for name, (kind, _) in tasks.items():
+                species = species_frame(kind, tables[name])
+                if 'bin' in species.columns:
+                    # -0.0 and 0.0 are one bin; spill and hash it as 0.0 like duration_bins labels it
+                    species = species.assign(bin=species['bin'] + 0.0)
+                buckets = hash_partitions(species[key_columns(kind)], num_partitions)
+                for bucket in np.unique(buckets):
+                    spill(species[buckets == bucket], os.path.join(spill_dir, f'{name}-{bucket}'),
+                          f'{partition:08d}.pkl')
+
+        results = {}
+        for name, (kind, _) in tasks.items():
+            merged = []
+            for bucket in range(num_partitions):
+                species = read_spilled(os.path.join(spill_dir, f'{name}-{bucket}'))
+                if species is not None:
+                    with span('partitioned.merge', rows=len(species)):
+                        merged.append(species.groupby(key_columns(kind), sort=False, as_index=False)['count'].sum())
+            if merged:
+                merged = pd.concat(merged, ignore_index=True)
+            else:
+                merged = DataFrame({column: [] for column in key_columns(kind)}).assign(count=np.int64(0)).iloc[:0]
+            results[name] = to_species_layout(kind, merged)
+        return results
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
@@ -0,0 +1,182 @@
+import atexit
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+# SPECIES_PROFILE=<name>.json profiles the run and writes it plus <name>.trace.json (Chrome trace) at exit;
+# SPECIES_PROFILE_MEMORY=1 additionally traces Python/numpy allocations for per-span peak memory
+PROFILE_ENV = 'SPECIES_PROFILE'
+PROFILE_MEMORY_ENV = 'SPECIES_PROFILE_MEMORY'
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class NullSpan:
+    """Stand-in for ``Span`` while profiling is off; entering, leaving and setting rows do nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def rows(self):
+        return None
+
+    @rows.setter
+    def rows(self, value):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, profiler, name, rows=None, args=None):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.args = args or {}
+        self.child_peak = 0
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.parent = profiler.stack[-1] if profiler.stack else None
+        profiler.stack.append(self)
+        if profiler.trace_memory:
+            self.traced_start = tracemalloc.get_traced_memory()[0]
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu_start
+        profiler = self.profiler
+        record = {'name': self.name, 'parent': None if self.parent is None else self.parent.name,
+                  'depth': len(profiler.stack) - 1, 'start_seconds': self.start - profiler.started,
+                  'wall_seconds': wall, 'cpu_seconds': cpu, 'rows': self.rows, 'peak_rss_bytes': peak_rss_bytes(),
+                  'pid': os.getpid(), 'tid': threading.get_ident()}
+        if profiler.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            record['peak_traced_bytes'] = peak - self.traced_start
+            if self.parent is not None:
+                # reset_peak cleared the parent's running peak, so hand this span's peak up
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+        if self.args:
+            record['args'] = self.args
+        profiler.stack.pop()
+        profiler.spans.append(record)
+        return False
+
+
+class Profiler:
+    """Collects named spans with wall time, CPU time, peak memory and row counts.
+
+    Spans nest; every finished span becomes one record. Off by default, in which case ``span``
+    hands out a shared no-op span. Spans are per process, so stages run in worker processes are
+    only seen as the span around the pool.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.spans = []
+        self.stack = []
+        self.started = time.perf_counter()
+
+    def enable(self, trace_memory=False):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.spans, self.stack = [], []
+        self.started = time.perf_counter()
+
+    def span(self, name, rows=None, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, rows, args)
+
+    def summary(self) -> dict:
+        """Totals per span name: calls, wall and CPU seconds, rows and the highest peak memory."""
+        totals = {}
+        for record in self.spans:
+            total = totals.setdefault(record['name'], {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                       'rows': 0, 'peak_rss_bytes': 0})
+            total['calls'] += 1
+            total['wall_seconds'] += record['wall_seconds']
+            total['cpu_seconds'] += record['cpu_seconds']
+            total['rows'] += record['rows'] or 0
+            total['peak_rss_bytes'] = max(total['peak_rss_bytes'], record['peak_rss_bytes'])
+            if 'peak_traced_bytes' in record:
+                total['peak_traced_bytes'] = max(total.get('peak_traced_bytes', 0), record['peak_traced_bytes'])
+        return totals
+
+    def to_json(self) -> dict:
+        return {'spans': sorted(self.spans, key=lambda record: record['start_seconds']), 'summary': self.summary()}
+
+    def to_chrome_trace(self) -> dict:
+        """Complete ("X") trace events, loadable in chrome://tracing and Perfetto."""
+        events = []
+        for record in self.spans:
+            args = {key: record[key] for key in ('cpu_seconds', 'rows', 'peak_rss_bytes', 'peak_traced_bytes')
+                    if record.get(key) is not None}
+            args.update(record.get('args', {}))
+            events.append({'name': record['name'], 'cat': record['name'].split('.', 1)[0], 'ph': 'X',
+                           'ts': record['start_seconds'] * 1e6, 'dur': record['wall_seconds'] * 1e6,
+                           'pid': record['pid'], 'tid': record['tid'], 'args': args})
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, indent=2, default=str)
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def save(self, path):
+        """Writes the JSON report to ``path`` and the Chrome trace to ``<path>.trace.json``."""
+        self.write_json(path)
+        self.write_chrome_trace(os.path.splitext(path)[0] + '.trace.json')
+
+
+PROFILER = Profiler()
+
+
+def span(name, rows=None, **args):
+    """``with span('stage', rows=n) as s:`` times the block when profiling is on."""
+    return PROFILER.span(name, rows, **args)
+
+
+def enable_profiling(output_path=None, trace_memory=False):
+    """Turns profiling on; with ``output_path`` the reports are written when the process exits."""
+    PROFILER.enable(trace_memory)
+    if output_path is not None:
+        atexit.register(PROFILER.save, output_path)
+
+
+# worker processes inherit the environment but must not overwrite the parent's report
+if os.environ.get(PROFILE_ENV) and multiprocessing.parent_process() is None:
+    enable_profiling(os.environ[PROFILE_ENV], os.environ.get(PROFILE_MEMORY_ENV, '') not in ('', '0'))
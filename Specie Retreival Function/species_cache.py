@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from log_cache import file_digest, load_encoded_log
+from species_engine import SPECIES_FORMAT, compute_species_tasks
+from species_store import STORE_FORMAT, STORE_SUFFIX, from_species_frame, read_species_table, write_species_table
+
+SPECIES_CACHE_DIR = os.environ.get('SPECIES_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'species_cache'))
+SPECIES_CACHE_MAX_BYTES = int(os.environ.get('SPECIES_CACHE_MAX_BYTES', 1 << 30))
+
+
+def canonical_params(params: dict) -> dict:
+    """``params`` as the species are computed from them, so equal parameters hash alike.
+
+    A duration ``lambda_value`` becomes its interval in nanoseconds (``1``, ``1.0`` and
+    ``np.int64(1)`` minutes are one interval) and numpy scalars become Python numbers.
+    """
+    canonical = {}
+    for key, value in params.items():
+        if key == 'lambda_value':
+            value = pd.Timedelta(minutes=value).value
+        elif isinstance(value, np.generic):
+            value = value.item()
+        canonical[key] = value
+    return canonical
+
+
+def task_key(log_digest: str, kind: str, params: dict) -> str:
+    key = json.dumps([SPECIES_FORMAT, STORE_FORMAT, log_digest, kind, canonical_params(params)], sort_keys=True,
+                     default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def directory_size(path) -> int:
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+
+
+class SpeciesCache:
+    """On-disk species tables keyed by (engine and store format, log content hash, species kind, parameters).
+
+    Entries are typed species tables; a hit refreshes the entry's modification time and the
+    least recently used entries are evicted once the cache outgrows ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=SPECIES_CACHE_DIR, max_bytes=SPECIES_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, log_digest, kind, params) -> str:
+        return os.path.join(self.cache_dir, task_key(log_digest, kind, params) + STORE_SUFFIX)
+
+    def get(self, log_digest, kind, params):
+        path = self.path(log_digest, kind, params)
+        try:
+            table = read_species_table(path).to_frame()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return table
+
+    def put(self, log_digest, name, kind, params, table):
+        path = self.path(log_digest, kind, params)
+        write_species_table(from_species_frame(name, kind, params, table), path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(STORE_SUFFIX) and entry.is_dir():
+                entries.append((entry.stat().st_mtime, directory_size(entry.path), entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    def compute(self, log_digest, load_log, tasks: dict, compute=compute_species_tasks) -> dict:
+        """Tables of every task, computing only the missing ones; ``load_log`` is only called on a miss."""
+        tables = {name: self.get(log_digest, kind, params) for name, (kind, params) in tasks.items()}
+        missing = {name: tasks[name] for name, table in tables.items() if table is None}
+        if missing:
+            computed = compute(load_log(), missing)
+            for name, (kind, params) in missing.items():
+                self.put(log_digest, name, kind, params, computed[name])
+                tables[name] = computed[name]
+        return tables
+
+
+def cached_species(csv_path, tasks: dict, cache: SpeciesCache = None, compute=compute_species_tasks) -> dict:
+    """``compute_species_tasks`` over a CSV log through the species cache."""
+    cache = SpeciesCache() if cache is None else cache
+    digest = file_digest(csv_path)
+    return cache.compute(digest, lambda: load_encoded_log(csv_path, digest=digest), tasks, compute)
@@ -0,0 +1,647 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series, Timedelta
+
+from profiling import span
+
+CASE_ID_KEY = 'case:concept:name'
+ACTIVITY_ID_KEY = 'concept:name'
+EVENT_INSTANCE_KEY = 'concept:instance'
+TIMESTAMP = 'time:timestamp'
+LIFECYCLE = 'lifecycle:transition'
+
+START_SPECIES = '$START$'
+END_SPECIES = '$END$'
+
+NAT = np.iinfo(np.int64).min
+LAST = np.iinfo(np.int64).max
+
+VARIANT_HASH_BASES = (np.uint64(1000003), np.uint64(2147483647))
+
+UNIFORM_LAMBDAS = (1, 5, 30)
+EXPONENTIAL_LAMBDA = 1.5
+
+# bump whenever the tables computed for a log and parameters change; every species cache key includes it
+SPECIES_FORMAT = 1
+
+
+class EncodedLog:
+    """Event log sorted once by (case, timestamp) and held as integer columns.
+
+    ``case_offsets[c]:case_offsets[c + 1]`` is the slice of events of case ``c``.
+    Timestamps are int64 nanoseconds with ``NAT`` for missing values.
+    """
+
+    def __init__(self, case_codes, activity_codes, timestamps, cases, activities,
+                 lifecycle_codes=None, lifecycles=None, instance_codes=None, instances=None):
+        self.case_codes = case_codes
+        self.activity_codes = activity_codes
+        self.timestamps = timestamps
+        self.cases = cases
+        self.activities = activities
+        self.lifecycle_codes = lifecycle_codes
+        self.lifecycles = lifecycles
+        self.instance_codes = instance_codes
+        self.instances = instances
+        self.case_offsets = np.searchsorted(case_codes, np.arange(len(cases) + 1))
+
+    def __len__(self):
+        return len(self.case_codes)
+
+    @property
+    def num_cases(self) -> int:
+        return len(self.cases)
+
+    @property
+    def num_activities(self) -> int:
+        return len(self.activities)
+
+    def has_lifecycle_info(self) -> bool:
+        return self.lifecycles is not None and len(self.lifecycles) > 1
+
+    def lifecycle_mask(self, *transitions) -> np.ndarray:
+        lowered = pd.Index(self.lifecycles).astype(str).str.lower()
+        wanted = np.flatnonzero(lowered.isin(transitions))
+        return np.isin(self.lifecycle_codes, wanted)
+
+    def to_frame(self, categorical: bool = False) -> DataFrame:
+        def labels(codes, values):
+            if categorical:
+                return pd.Categorical.from_codes(codes, categories=values)
+            column = np.asarray(values, dtype=object)[codes]
+            column[codes < 0] = np.nan
+            return column
+
+        frame = DataFrame({
+            CASE_ID_KEY: labels(self.case_codes, self.cases),
+            ACTIVITY_ID_KEY: labels(self.activity_codes, self.activities),
+            TIMESTAMP: pd.to_datetime(self.timestamps, utc=True),
+        })
+        if self.lifecycle_codes is not None:
+            frame[LIFECYCLE] = labels(self.lifecycle_codes, self.lifecycles)
+        if self.instance_codes is not None:
+            frame[EVENT_INSTANCE_KEY] = labels(self.instance_codes, self.instances)
+        return frame
+
+
+def to_nanoseconds(timestamps: Series) -> np.ndarray:
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps, format='ISO8601', errors='coerce', utc=True)
+    return pd.DatetimeIndex(timestamps).as_unit('ns').asi8
+
+
+def sortable_timestamps(timestamps: np.ndarray) -> np.ndarray:
+    return np.where(timestamps == NAT, LAST, timestamps)
+
+
+def encode_log(log: DataFrame, lifecycles=None) -> EncodedLog:
+    with span('log.encode', rows=len(log)):
+        return _encode_log(log, lifecycles)
+
+
+def _encode_log(log: DataFrame, lifecycles=None) -> EncodedLog:
+    # rows without a case or activity never form a species in the pandas implementations
+    log = log[log[CASE_ID_KEY].notna() & log[ACTIVITY_ID_KEY].notna()]
+
+    with span('log.factorize', rows=len(log)):
+        case_codes, cases = pd.factorize(log[CASE_ID_KEY], sort=True)
+        activity_codes, activities = pd.factorize(log[ACTIVITY_ID_KEY], sort=True)
+    with span('log.to_datetime', rows=len(log)):
+        timestamps = to_nanoseconds(log[TIMESTAMP])
+
+    with span('log.sort', rows=len(log)):
+        order = np.lexsort((sortable_timestamps(timestamps), case_codes))
+
+    lifecycle_codes = instance_codes = instances = None
+    if LIFECYCLE in log.columns:
+        if lifecycles is None:
+            lifecycle_codes, lifecycles = pd.factorize(log[LIFECYCLE])
+        else:
+            lifecycles = pd.Index(lifecycles)
+            lifecycle_codes = pd.Categorical(log[LIFECYCLE], categories=lifecycles).codes
+        lifecycle_codes = lifecycle_codes[order].astype(np.int8)
+    else:
+        lifecycles = None
+    if EVENT_INSTANCE_KEY in log.columns:
+        instance_codes, instances = pd.factorize(log[EVENT_INSTANCE_KEY], sort=True)
+        instance_codes = instance_codes[order]
+
+    return EncodedLog(case_codes[order].astype(np.int64), activity_codes[order].astype(np.int32),
+                      timestamps[order], np.asarray(cases, dtype=object), np.asarray(activities, dtype=object),
+                      lifecycle_codes, lifecycles, instance_codes, instances)
+
+
+def calculate_Q1_Q2(table):
+    frequency_counts = np.bincount(species_counts(table).astype(np.int64), minlength=3)
+    return int(frequency_counts[1]), int(frequency_counts[2])
+
+
+def pack_codes(codes, sizes) -> np.ndarray:
+    if np.prod([float(size) for size in sizes]) >= 2 ** 63:
+        raise OverflowError('packed key space does not fit into int64')
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    for code, size in zip(codes, sizes):
+        key = key * np.int64(size) + code
+    return key
+
+
+def activity_species(log: EncodedLog):
+    counts = np.bincount(log.activity_codes, minlength=log.num_activities)
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    species = DataFrame({'species': log.activities[order], 'count': counts[order]})
+    return species, len(species)
+
+
+def directly_follows_pairs(log: EncodedLog, respect_lifecycle=True, include_startend=True):
+    """(case, packed source/target key) of every directly-follows occurrence; keys use ``num_activities + 2`` codes."""
+    cases, activities = log.case_codes, log.activity_codes
+    if respect_lifecycle and log.has_lifecycle_info():
+        complete = log.lifecycle_mask('complete')
+        cases, activities = cases[complete], activities[complete]
+
+    start, end = log.num_activities, log.num_activities + 1
+    same_case = cases[1:] == cases[:-1]
+    pair_cases = [cases[1:][same_case]]
+    sources = [activities[:-1][same_case]]
+    targets = [activities[1:][same_case]]
+    if include_startend and len(cases):
+        first = np.r_[True, ~same_case]
+        last = np.r_[~same_case, True]
+        pair_cases += [cases[first], cases[last]]
+        sources += [np.full(first.sum(), start), activities[last]]
+        targets += [activities[first], np.full(last.sum(), end)]
+
+    size = log.num_activities + 2
+    return np.concatenate(pair_cases), pack_codes([np.concatenate(sources), np.concatenate(targets)], [size, size])
+
+
+def directly_follows_species(log: EncodedLog, respect_lifecycle=True, include_startend=True):
+    _, pairs = directly_follows_pairs(log, respect_lifecycle, include_startend)
+    size = log.num_activities + 2
+    keys, counts = np.unique(pairs, return_counts=True)
+    labels = np.append(log.activities, [START_SPECIES, END_SPECIES])
+    species = DataFrame({'species': labels[keys // size], 'next_species': labels[keys % size], 'count': counts})
+    species = species.sort_values(['species', 'next_species'], ignore_index=True)
+    return species, len(species)
+
+
+def k_gram_keys(log: EncodedLog, ks, respect_lifecycle=True) -> dict:
+    """{k: (case, packed key)} of every k-gram of every case, all k in one rolling pass.
+
+    Each case is padded with ``max(ks) - 1`` ``$START$``/``$END$`` codes; a k-gram may use at most
+    ``k - 1`` of them on either side, so a case of length L has L + k - 1 k-grams. Keys are
+    ``sum(code_i * size ** (k - 1 - i))`` over ``size = num_activities + 2`` codes and are extended
+    from the (k - 1)-gram keys by one multiply-add.
+    """
+    cases, activities = log.case_codes, log.activity_codes
+    if respect_lifecycle and log.has_lifecycle_info():
+        complete = log.lifecycle_mask('complete')
+        cases, activities = cases[complete], activities[complete]
+    size = log.num_activities + 2
+    max_k = max(ks)
+    if float(size) ** max_k >= 2 ** 63:
+        raise OverflowError('packed key space does not fit into int64')
+
+    case_ids, lengths = np.unique(cases, return_counts=True)
+    pad = max_k - 1
+    padded_lengths = lengths + 2 * pad
+    padded_starts = np.r_[0, np.cumsum(padded_lengths)[:-1]]
+    # position of every padded slot relative to its case, and the last position holding an activity
+    relative = np.arange(padded_lengths.sum()) - np.repeat(padded_starts, padded_lengths)
+    last = np.repeat(pad + lengths - 1, padded_lengths)
+    padded = np.where(relative > last, log.num_activities + 1, log.num_activities)
+    padded[(relative >= pad) & (relative <= last)] = activities
+    window_cases = np.repeat(case_ids, padded_lengths)
+
+    results = {}
+    keys = padded
+    for k in range(1, max_k + 1):
+        if k > 1:
+            keys = keys[:-1] * np.int64(size) + padded[k - 1:]
+        if k in ks:
+            starts = relative[:len(keys)]
+            valid = (starts >= pad - k + 1) & (starts <= last[:len(keys)])
+            results[k] = (window_cases[:len(keys)][valid], keys[valid])
+    return results
+
+
+def k_gram_labels(keys: np.ndarray, k: int, activities) -> list:
+    labels = np.append(np.asarray(activities, dtype=object).astype(str), [START_SPECIES, END_SPECIES])
+    size = len(labels)
+    codes = np.empty((len(keys), k), dtype=np.int64)
+    remaining = keys.copy()
+    for position in range(k - 1, -1, -1):
+        remaining, codes[:, position] = np.divmod(remaining, size)
+    return ['->'.join(gram) for gram in labels[codes].tolist()]
+
+
+def k_gram_species(log: EncodedLog, ks, respect_lifecycle=True) -> list:
+    """One species table per k of ``ks``, k-grams labelled like directly-follows species (``A->B->C``)."""
+    species = {}
+    for k, (_, keys) in k_gram_keys(log, ks, respect_lifecycle).items():
+        keys, counts = np.unique(keys, return_counts=True)
+        table = DataFrame({'species': k_gram_labels(keys, k, log.activities), 'count': counts})
+        species[k] = table.sort_values('species', ignore_index=True)
+    return [species[k] for k in ks]
+
+
+def encode_variants(activity_codes: np.ndarray, case_offsets: np.ndarray):
+    """Assigns a variant id to every case without materialising any per-case sequence.
+
+    Cases are keyed by their length and two polynomial hashes of their activity codes,
+    computed with one ``reduceat`` over the flat code array. Every case is then compared
+    element-wise with its variant's representative; cases whose hashes collide with a
+    different trace are regrouped by their exact code sequences, so collisions cannot merge variants.
+    Returns ``(variant_of_case, representative_case_of_variant)``.
+    """
+    lengths = np.diff(case_offsets)
+    if len(lengths) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = case_offsets[:-1]
+    positions = np.arange(len(activity_codes)) - np.repeat(starts, lengths)
+    codes = activity_codes.astype(np.uint64) + np.uint64(1)
+
+    keys = [lengths.astype(np.uint64)]
+    for base in VARIANT_HASH_BASES:
+        powers = np.cumprod(np.full(lengths.max(), base, dtype=np.uint64))
+        keys.append(np.add.reduceat(codes * powers[positions], starts))
+
+    order = np.lexsort(keys[::-1])
+    sorted_keys = np.stack([key[order] for key in keys])
+    new_variant = np.r_[True, (sorted_keys[:, 1:] != sorted_keys[:, :-1]).any(axis=0)]
+    variant_of_case = np.empty(len(lengths), dtype=np.int64)
+    variant_of_case[order] = np.cumsum(new_variant) - 1
+    representatives = order[new_variant]
+
+    mirrored = case_offsets[representatives[variant_of_case]]
+    differs = activity_codes[np.repeat(mirrored, lengths) + positions] != activity_codes
+    if differs.any():
+        # colliding cases never equal their representative, only each other: group them exactly
+        collided = np.flatnonzero(np.bincount(np.repeat(np.arange(len(lengths)), lengths)[differs],
+                                              minlength=len(lengths)))
+        variants = {}
+        extra = []
+        for case in collided:
+            sequence = activity_codes[case_offsets[case]:case_offsets[case + 1]].tobytes()
+            if sequence not in variants:
+                variants[sequence] = len(representatives) + len(extra)
+                extra.append(case)
+            variant_of_case[case] = variants[sequence]
+        representatives = np.concatenate([representatives, np.array(extra, dtype=representatives.dtype)])
+    return variant_of_case, representatives
+
+
+def variant_species_table(activity_codes: np.ndarray, case_offsets: np.ndarray, activities) -> DataFrame:
+    variant_of_case, representatives = encode_variants(activity_codes, case_offsets)
+    counts = np.bincount(variant_of_case, minlength=len(representatives))
+
+    activities = np.asarray(activities, dtype=object).astype(str)
+    labels = [','.join(activities[activity_codes[case_offsets[case]:case_offsets[case + 1]]])
+              for case in representatives]
+    # variants with equal counts by label, so the order does not depend on the hashes
+    species = DataFrame({'species': labels, 'count': counts}).sort_values('species', kind='stable')
+    return species.sort_values('count', ascending=False, kind='stable', ignore_index=True)
+
+
+def trace_variant_species(log: EncodedLog):
+    species = variant_species_table(log.activity_codes, log.case_offsets, log.activities)
+    return species, len(species)
+
+
+def duration_arrays(log: EncodedLog):
+    """Per-event (case, activity, duration) of the duration log, durations in ns or ``NAT``."""
+    if log.has_lifecycle_info():
+        keep = np.flatnonzero(log.lifecycle_mask('start', 'complete'))
+        sort_keys = [sortable_timestamps(log.timestamps[keep])]
+        if log.instance_codes is not None:
+            sort_keys.append(np.where(log.instance_codes[keep] < 0, LAST, log.instance_codes[keep]))
+        order = keep[np.lexsort(sort_keys + [log.activity_codes[keep], log.case_codes[keep]])]
+
+        cases, activities = log.case_codes[order], log.activity_codes[order]
+        timestamps = log.timestamps[order]
+        complete = log.lifecycle_mask('complete')[order]
+
+        with_start = np.zeros(len(order), dtype=bool)
+        with_start[1:] = (~complete[:-1]) & (cases[1:] == cases[:-1]) & (activities[1:] == activities[:-1])
+        previous = np.r_[timestamps[:1], timestamps[:-1]]
+        from_timestamps = np.where(with_start, previous, timestamps)
+        cases, activities, until_timestamps = cases[complete], activities[complete], timestamps[complete]
+        from_timestamps = from_timestamps[complete]
+    else:
+        cases, activities, until_timestamps = log.case_codes, log.activity_codes, log.timestamps
+        if log.lifecycles is not None:
+            complete = log.lifecycle_mask('complete')
+            cases, activities, until_timestamps = cases[complete], activities[complete], until_timestamps[complete]
+        at_border = np.r_[True, cases[1:] != cases[:-1]]
+        from_timestamps = np.where(at_border, until_timestamps, np.r_[until_timestamps[:1], until_timestamps[:-1]])
+
+    durations = until_timestamps - from_timestamps
+    durations[(until_timestamps == NAT) | (from_timestamps == NAT)] = NAT
+    return cases, activities, durations
+
+
+def duration_bins(durations: np.ndarray, intervals) -> np.ndarray:
+    """Bin index of every duration for each ``(interval, exponential)`` pair, one row per pair; NaN where undefined."""
+    scales = np.array([float(interval.value) for interval, _ in intervals])
+    exponential = np.array([bool(is_exponential) for _, is_exponential in intervals], dtype=bool)
+    factors = durations.astype(np.float64)[np.newaxis, :] / scales[:, np.newaxis]
+    factors[:, durations == NAT] = np.nan
+    bins = np.ceil(factors)
+    if exponential.any():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            exponential_bins = np.ceil(np.log2(factors[exponential]))
+        exponential_bins[(exponential_bins < 0) & ~(exponential_bins == -np.inf)] = 0
+        bins[exponential] = exponential_bins
+    # ceil rounds (-1, 0) to -0.0; label that bin 0.0 whichever mode or chunk computes it
+    return bins + 0.0
+
+
+def duration_triples(num_cases: int, num_activities: int, durations, intervals):
+    """Distinct (bag, case, activity, bin) occurrences packed as ``((bag * cases + case) * activities + activity) * bins + bin``."""
+    cases, activities, durations = durations
+    bins = duration_bins(durations, intervals)
+    bags, events = np.nonzero(~np.isnan(bins))
+    bin_values, bin_codes = np.unique(bins[bags, events], return_inverse=True)
+
+    sizes = [len(intervals), num_cases, num_activities, len(bin_values)]
+    return np.unique(pack_codes([bags, cases[events], activities[events], bin_codes.ravel()], sizes)), bin_values
+
+
+def classify_durations(durations, num_cases: int, activity_labels, intervals) -> list:
+    """Duration species for several uniform/exponential bags in one pass, one Series per ``(interval, exponential)``."""
+    triples, bin_values = duration_triples(num_cases, len(activity_labels), durations, intervals)
+    num_bins = len(bin_values)
+    activity_bins = len(activity_labels) * num_bins
+    bags, occurrences = np.divmod(triples, num_cases * activity_bins)
+    pairs, counts = np.unique(bags * activity_bins + occurrences % activity_bins, return_counts=True)
+    bags, activity_bin = np.divmod(pairs, activity_bins)
+    activities, bin_codes = np.divmod(activity_bin, num_bins)
+
+    bounds = np.searchsorted(bags, np.arange(len(intervals) + 1))
+    species = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        keys = zip(activity_labels[activities[low:high]], bin_values[bin_codes[low:high]].tolist())
+        species.append(Series(counts[low:high], index=pd.Index(list(keys), tupleize_cols=False), name='count'))
+    return species
+
+
+def duration_species(log: EncodedLog, durations, interval: Timedelta, exponential: bool = False) -> Series:
+    return classify_durations(durations, log.num_cases, log.activities, [(interval, exponential)])[0]
+
+
+def uniform_species_key(lambda_value) -> str:
+    # 1 and 1.0 minutes name one table, zt1
+    if float(lambda_value).is_integer():
+        lambda_value = int(lambda_value)
+    return f'uniform_duration_species_zt{lambda_value}'
+
+
+def k_gram_species_key(k) -> str:
+    return f'k_gram_species_k{k}'
+
+
+def species_tasks(uniform_lambdas=UNIFORM_LAMBDAS, exponential_lambda=EXPONENTIAL_LAMBDA,
+                  respect_lifecycle=True, include_startend=True, k_grams=()) -> dict:
+    tasks = {
+        'activity_species': ('activity', {}),
+        'directly_follows_species': ('directly_follows', {'respect_lifecycle': respect_lifecycle,
+                                                          'include_startend': include_startend}),
+        'trace_variant_species': ('trace_variant', {}),
+    }
+    for lambda_value in uniform_lambdas:
+        tasks[uniform_species_key(lambda_value)] = ('uniform_duration', {'lambda_value': lambda_value})
+    if exponential_lambda is not None:
+        tasks['exponential_duration_species_zte2'] = ('exponential_duration', {'lambda_value': exponential_lambda})
+    for k in k_grams:
+        tasks[k_gram_species_key(k)] = ('k_gram', {'k': k, 'respect_lifecycle': respect_lifecycle})
+    return tasks
+
+
+def compute_species(log: EncodedLog, kind: str, params: dict, durations=None):
+    if kind == 'activity':
+        return activity_species(log)[0]
+    if kind == 'directly_follows':
+        return directly_follows_species(log, **params)[0]
+    if kind == 'trace_variant':
+        return trace_variant_species(log)[0]
+    if kind == 'k_gram':
+        return k_gram_species(log, [params['k']], params.get('respect_lifecycle', True))[0]
+    if kind in ('uniform_duration', 'exponential_duration'):
+        if durations is None:
+            durations = duration_arrays(log)
+        return duration_species(log, durations, pd.Timedelta(minutes=params['lambda_value']),
+                                exponential=(kind == 'exponential_duration'))
+    raise ValueError(f'unknown species kind: {kind}')
+
+
+def compute_all_species(log: EncodedLog, uniform_lambdas=UNIFORM_LAMBDAS, exponential_lambda=EXPONENTIAL_LAMBDA,
+                        respect_lifecycle=True, include_startend=True, k_grams=()) -> dict:
+    return compute_species_tasks(log, species_tasks(uniform_lambdas, exponential_lambda, respect_lifecycle,
+                                                    include_startend, k_grams))
+
+
+def compute_species_tasks(log: EncodedLog, tasks: dict) -> dict:
+    """Tables of every (name -> (kind, params)) task; all duration bags share one classification pass and
+    all k-grams with the same lifecycle handling one rolling pass."""
+    bags = {name: (pd.Timedelta(minutes=params['lambda_value']), kind == 'exponential_duration')
+            for name, (kind, params) in tasks.items() if kind in ('uniform_duration', 'exponential_duration')}
+    k_grams = {}
+    for name, (kind, params) in tasks.items():
+        if kind == 'k_gram':
+            k_grams.setdefault(params.get('respect_lifecycle', True), {})[name] = params['k']
+    tables = {}
+    for name, (kind, params) in tasks.items():
+        if name not in bags and kind != 'k_gram':
+            with span(f'species.{name}', rows=len(log)):
+                tables[name] = compute_species(log, kind, params)
+    for respect_lifecycle, ks in k_grams.items():
+        with span('species.k_grams', rows=len(log), ks=list(ks.values())):
+            tables.update(zip(ks, k_gram_species(log, list(ks.values()), respect_lifecycle)))
+    if bags:
+        with span('species.durations', rows=len(log)):
+            durations = duration_arrays(log)
+        with span('species.duration_bags', rows=len(durations[0]), bags=list(bags)):
+            tables.update(zip(bags, classify_durations(durations, log.num_cases, log.activities,
+                                                       list(bags.values()))))
+    return {name: tables[name] for name in tasks}
+
+
+def case_species_incidence(log: EncodedLog, kind: str, params: dict, durations=None):
+    """Sparse case x species abundance matrix in coordinate form.
+
+    Returns ``(cases, species, values, num_species)``: case ``cases[i]`` contributes ``values[i]``
+    to species ``species[i]``. Summing over all cases gives the counts of ``compute_species``.
+    """
+    if kind == 'trace_variant':
+        variant_of_case, representatives = encode_variants(log.activity_codes, log.case_offsets)
+        return (np.arange(log.num_cases), variant_of_case, np.ones(log.num_cases, dtype=np.int64),
+                len(representatives))
+
+    if kind == 'activity':
+        keys = pack_codes([log.case_codes, log.activity_codes], [log.num_cases, log.num_activities])
+        keys, values = np.unique(keys, return_counts=True)
+        cases, species = np.divmod(keys, log.num_activities)
+    elif kind == 'directly_follows':
+        pair_cases, pairs = directly_follows_pairs(log, **params)
+        size = (log.num_activities + 2) ** 2
+        keys, values = np.unique(pack_codes([pair_cases, pairs], [log.num_cases, size]), return_counts=True)
+        cases, species = np.divmod(keys, size)
+    elif kind == 'k_gram':
+        k_gram_cases, keys = k_gram_keys(log, [params['k']], params.get('respect_lifecycle', True))[params['k']]
+        key_ids, keys = np.unique(keys, return_inverse=True)
+        keys, values = np.unique(pack_codes([k_gram_cases, keys.ravel()], [log.num_cases, len(key_ids)]),
+                                 return_counts=True)
+        cases, species = np.divmod(keys, len(key_ids))
+    elif kind in ('uniform_duration', 'exponential_duration'):
+        if durations is None:
+            durations = duration_arrays(log)
+        interval = (pd.Timedelta(minutes=params['lambda_value']), kind == 'exponential_duration')
+        triples, bin_values = duration_triples(log.num_cases, log.num_activities, durations, [interval])
+        cases, species = np.divmod(triples, log.num_activities * len(bin_values))
+        values = np.ones(len(triples), dtype=np.int64)
+    else:
+        raise ValueError(f'unknown species kind: {kind}')
+
+    species_ids, species = np.unique(species, return_inverse=True)
+    return cases, species.ravel(), values, len(species_ids)
+
+
+def species_counts(table) -> np.ndarray:
+    if isinstance(table, Series):
+        return table.to_numpy()
+    return table['count'].to_numpy()
+
+
+def species_keys(table) -> list:
+    if isinstance(table, Series):
+        return list(table.index)
+    if 'next_species' in table.columns:
+        return list(zip(table['species'], table['next_species']))
+    return list(table['species'])
+
+
+def species_table(kind: str, counter: dict):
+    """Rebuilds a species table from a {species key: count} mapping in the layout compute_species returns."""
+    if kind in ('uniform_duration', 'exponential_duration'):
+        keys = sorted(counter)
+        return Series([counter[key] for key in keys], index=pd.Index(keys, tupleize_cols=False), name='count',
+                      dtype=np.int64)
+    if kind == 'directly_follows':
+        keys = sorted(counter)
+        return DataFrame({'species': [key[0] for key in keys], 'next_species': [key[1] for key in keys],
+                          'count': np.array([counter[key] for key in keys], dtype=np.int64)})
+    if kind == 'k_gram':
+        keys = sorted(counter)
+        return DataFrame({'species': keys, 'count': np.array([counter[key] for key in keys], dtype=np.int64)})
+    species = DataFrame({'species': list(counter), 'count': np.fromiter(counter.values(), dtype=np.int64,
+                                                                        count=len(counter))})
+    # ties by label as in variant_species_table, not in the order the keys were first counted
+    species = species.sort_values('species', kind='stable')
+    return species.sort_values('count', ascending=False, kind='stable', ignore_index=True)
+
+
+def to_species_csv_frame(name: str, table) -> DataFrame:
+    if isinstance(table, Series):
+        return DataFrame({'Activity': [str(key) for key in table.index], 'Count': table.to_numpy()})
+    if name.startswith('directly_follows'):
+        labels = table['species'].astype(str) + '->' + table['next_species'].astype(str)
+        return DataFrame({'directly_follows': labels, 'count': table['count']})
+    if name.startswith('trace_variant'):
+        return DataFrame({'trace_variant': table['species'], 'count': table['count']})
+    if name.startswith('k_gram'):
+        return DataFrame({'k_gram': table['species'], 'count': table['count']})
+    return DataFrame({'activity': table['species'], 'count': table['count']})
+
+
+def save_species_tables(tables: dict, output_dir: str, prefix: str = ''):
+    os.makedirs(output_dir, exist_ok=True)
+    for name, table in tables.items():
+        to_species_csv_frame(name, table).to_csv(os.path.join(output_dir, f'{prefix}{name}.csv'), index=False)
+
+
+SHARED_COLUMNS = ('case_codes', 'activity_codes', 'timestamps', 'lifecycle_codes', 'instance_codes')
+
+
+class SharedEncodedLog:
+    """Copies the integer columns of an EncodedLog into named shared memory blocks.
+
+    Only ``spec`` (block names, dtypes, shapes and the small label arrays) is sent to
+    worker processes; the event columns themselves are never pickled.
+    """
+
+    def __init__(self, log: EncodedLog):
+        self._blocks = []
+        columns = {}
+        for column in SHARED_COLUMNS:
+            values = getattr(log, column)
+            if values is None:
+                continue
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            self._blocks.append(block)
+            columns[column] = (block.name, values.dtype.str, values.shape)
+        self.spec = (columns, log.num_cases, log.activities, log.lifecycles)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_encoded_log(spec):
+    columns, num_cases, activities, lifecycles = spec
+    blocks, arrays = [], {}
+    for column, (name, dtype, shape) in columns.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[column] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    log = EncodedLog(arrays['case_codes'], arrays['activity_codes'], arrays['timestamps'],
+                     pd.RangeIndex(num_cases), activities, arrays.get('lifecycle_codes'), lifecycles,
+                     arrays.get('instance_codes'))
+    return log, blocks
+
+
+_worker_log = None
+
+
+def _init_species_worker(spec):
+    global _worker_log
+    _worker_log = attach_encoded_log(spec)
+
+
+def _run_species_task(name, kind, params):
+    started = time.perf_counter()
+    table = compute_species(_worker_log[0], kind, params)
+    Q1, Q2 = calculate_Q1_Q2(table)
+    return name, table, Q1, Q2, time.perf_counter() - started
+
+
+def compute_species_in_parallel(log: EncodedLog, tasks: dict = None, max_workers=None) -> dict:
+    """Runs every (name -> (kind, params)) task and its Q1/Q2 follow-up in a process pool.
+
+    Returns ``{name: (table, species_count, Q1, Q2, wall_seconds)}`` in task order.
+    """
+    if tasks is None:
+        tasks = species_tasks()
+    results = {}
+    with span('species.parallel', rows=len(log), tasks=list(tasks)), SharedEncodedLog(log) as shared, \
+            ProcessPoolExecutor(max_workers=max_workers, initializer=_init_species_worker,
+                                initargs=(shared.spec,)) as executor:
+        futures = [executor.submit(_run_species_task, name, kind, params) for name, (kind, params) in tasks.items()]
+        for future in as_completed(futures):
+            name, table, Q1, Q2, seconds = future.result()
+            results[name] = (table, len(table), Q1, Q2, seconds)
+    return {name: results[name] for name in tasks}
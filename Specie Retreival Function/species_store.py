@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+from species_engine import EXPONENTIAL_LAMBDA, species_tasks
+
+STORE_FORMAT = 1
+STORE_SUFFIX = '.species'
+
+COLUMNS = ('species_codes', 'next_codes', 'variant_offsets', 'bins', 'counts')
+
+
+class SpeciesTable:
+    """A species table held as typed columns.
+
+    ``labels`` is the activity dictionary. Activity and duration species use ``species_codes`` into it; directly-follows
+    species use ``species_codes``/``next_codes`` into it, ``$START$``/``$END$`` included; trace variant ``i`` is the
+    activity sequence ``species_codes[variant_offsets[i]:variant_offsets[i + 1]]``. Duration species carry their bin
+    in ``bins``. ``counts`` is int64 throughout.
+    """
+
+    def __init__(self, name, kind, params, labels, counts, species_codes=None, next_codes=None,
+                 variant_offsets=None, bins=None):
+        self.name = name
+        self.kind = kind
+        self.params = params
+        self.labels = np.asarray(labels, dtype=object)
+        self.counts = counts
+        self.species_codes = species_codes
+        self.next_codes = next_codes
+        self.variant_offsets = variant_offsets
+        self.bins = bins
+
+    def __len__(self):
+        return len(self.counts)
+
+    def to_frame(self):
+        """The table in the layout ``compute_species`` returns for its kind."""
+        counts = np.asarray(self.counts)
+        if self.kind in ('uniform_duration', 'exponential_duration'):
+            keys = zip(self.labels[self.species_codes], np.asarray(self.bins).tolist())
+            return Series(counts, index=pd.Index(list(keys), tupleize_cols=False), name='count')
+        if self.kind == 'directly_follows':
+            return DataFrame({'species': self.labels[self.species_codes], 'next_species': self.labels[self.next_codes],
+                              'count': counts})
+        if self.kind == 'trace_variant':
+            activities = self.labels.astype(str)
+            offsets = self.variant_offsets
+            labels = [','.join(activities[self.species_codes[offsets[i]:offsets[i + 1]]]) for i in range(len(counts))]
+            return DataFrame({'species': labels, 'count': counts})
+        return DataFrame({'species': self.labels[self.species_codes], 'count': counts})
+
+
+def species_kind(name: str):
+    """``(kind, params)`` of a species table name such as ``uniform_duration_species_zt5``."""
+    tasks = species_tasks(uniform_lambdas=(), exponential_lambda=EXPONENTIAL_LAMBDA)
+    if name in tasks:
+        return tasks[name]
+    prefix = 'uniform_duration_species_zt'
+    if name.startswith(prefix):
+        lambda_value = float(name[len(prefix):])
+        return 'uniform_duration', {'lambda_value': int(lambda_value) if lambda_value.is_integer() else lambda_value}
+    prefix = 'k_gram_species_k'
+    if name.startswith(prefix):
+        return 'k_gram', {'k': int(name[len(prefix):]), 'respect_lifecycle': True}
+    raise ValueError(f'unknown species table: {name}')
+
+
+def from_species_frame(name, kind, params, table) -> SpeciesTable:
+    """Encodes a table in the layout ``compute_species`` returns."""
+    if kind in ('uniform_duration', 'exponential_duration'):
+        activities, bins = zip(*table.index) if len(table) else ((), ())
+        codes, labels = pd.factorize(pd.Index(activities, dtype=object), sort=True)
+        return SpeciesTable(name, kind, params, labels, table.to_numpy().astype(np.int64),
+                            species_codes=codes.astype(np.int32), bins=np.asarray(bins, dtype=np.float64))
+
+    counts = table['count'].to_numpy().astype(np.int64)
+    if kind == 'directly_follows':
+        codes, labels = pd.factorize(pd.concat([table['species'], table['next_species']], ignore_index=True),
+                                     sort=True)
+        codes = codes.astype(np.int32)
+        return SpeciesTable(name, kind, params, labels, counts, species_codes=codes[:len(table)],
+                            next_codes=codes[len(table):])
+    if kind == 'trace_variant':
+        sequences = [variant.split(',') for variant in table['species'].astype(str)]
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+        codes, labels = pd.factorize(pd.Index([a for sequence in sequences for a in sequence], dtype=object),
+                                     sort=True)
+        return SpeciesTable(name, kind, params, labels, counts, species_codes=codes.astype(np.int32),
+                            variant_offsets=np.r_[0, np.cumsum(lengths)])
+    codes, labels = pd.factorize(table['species'], sort=True)
+    return SpeciesTable(name, kind, params, labels, counts, species_codes=codes.astype(np.int32))
+
+
+def write_species_table(table: SpeciesTable, path):
+    """Stores the table as one .npy file per column plus a JSON header with its kind, parameters and dictionary."""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+    for column in COLUMNS:
+        values = getattr(table, column)
+        if values is not None:
+            np.save(os.path.join(staging, f'{column}.npy'), np.asarray(values))
+    header = {'format': STORE_FORMAT, 'name': table.name, 'kind': table.kind, 'params': table.params,
+              'labels': [str(label) for label in table.labels]}
+    with open(os.path.join(staging, 'species.json'), 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(staging, path)
+
+
+def read_species_table(path, mmap_mode='r') -> SpeciesTable:
+    with open(os.path.join(path, 'species.json'), encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('format') != STORE_FORMAT:
+        raise ValueError(f'unsupported species table format in {path}')
+    arrays = {}
+    for column in COLUMNS:
+        file = os.path.join(path, f'{column}.npy')
+        arrays[column] = np.load(file, mmap_mode=mmap_mode) if os.path.exists(file) else None
+    return SpeciesTable(header['name'], header['kind'], header['params'], header['labels'], **arrays)
+
+
+def save_species_store(tables: dict, output_dir: str, prefix: str = '', tasks: dict = None):
+    """``save_species_tables`` counterpart writing ``<prefix><name>.species`` directories."""
+    for name, table in tables.items():
+        kind, params = tasks[name] if tasks is not None and name in tasks else species_kind(name)
+        write_species_table(from_species_frame(name, kind, params, table),
+                            os.path.join(output_dir, f'{prefix}{name}{STORE_SUFFIX}'))
+
+
+def parse_duration_species(keys):
+    """Splits ``"('activity', bin)"`` keys of the duration species CSVs into labels and float bins."""
+    labels, bins = [], []
+    for key in keys:
+        label, value = key[1:-1].rsplit(', ', 1)
+        labels.append(label[1:-1])
+        bins.append(float(value))
+    return labels, np.array(bins)
+
+
+def read_species_csv(csv_path, name=None):
+    """Reads one of the species CSVs ``save_species_tables`` writes back into the ``compute_species`` layout."""
+    name = name or os.path.splitext(os.path.basename(csv_path))[0]
+    kind, params = species_kind(name)
+    df = pd.read_csv(csv_path, keep_default_na=False)
+    if kind in ('uniform_duration', 'exponential_duration'):
+        labels, bins = parse_duration_species(df['Activity'])
+        table = Series(df['Count'].to_numpy(), index=pd.Index(list(zip(labels, bins.tolist())), tupleize_cols=False),
+                       name='count')
+    elif kind == 'directly_follows':
+        pairs = df['directly_follows'].str.split('->', n=1, expand=True)
+        table = DataFrame({'species': pairs[0], 'next_species': pairs[1], 'count': df['count']})
+    else:
+        table = DataFrame({'species': df[df.columns[0]], 'count': df['count']})
+    return name, kind, params, table
+
+
+def convert_species_csv(csv_path, output_path=None) -> str:
+    name, kind, params, table = read_species_csv(csv_path)
+    if output_path is None:
+        output_path = os.path.splitext(csv_path)[0] + STORE_SUFFIX
+    write_species_table(from_species_frame(name, kind, params, table), output_path)
+    return output_path
+
+
+def convert_species_dir(input_dir, output_dir=None) -> list:
+    """Converts every species CSV of a dataset folder; the typed tables go next to the CSVs by default."""
+    converted = []
+    for file in sorted(os.listdir(input_dir)):
+        stem, extension = os.path.splitext(file)
+        if extension != '.csv':
+            continue
+        try:
+            species_kind(stem)
+        except ValueError:
+            continue
+        converted.append(convert_species_csv(os.path.join(input_dir, file),
+                                             os.path.join(output_dir or input_dir, stem + STORE_SUFFIX)))
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts species CSVs into the typed species table format.')
+    parser.add_argument('data_dirs', nargs='+', help='folders holding the species CSVs of one dataset each')
+    parser.add_argument('--output-dir', default=None, help='defaults to each input folder')
+    args = parser.parse_args()
+    for data_dir in args.data_dirs:
+        output_dir = None if args.output_dir is None else os.path.join(args.output_dir, os.path.basename(
+            os.path.normpath(data_dir)))
+        for path in convert_species_dir(data_dir, output_dir):
+            print(f"Converted: {path}")
@@ -0,0 +1,177 @@
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+from pandas import DataFrame
+
+from profiling import span
+from species_engine import (ACTIVITY_ID_KEY, CASE_ID_KEY, EVENT_INSTANCE_KEY, EXPONENTIAL_LAMBDA, LIFECYCLE,
+                            TIMESTAMP, UNIFORM_LAMBDAS, EncodedLog, compute_species, duration_arrays, encode_log,
+                            save_species_tables, species_counts, species_keys, species_table, species_tasks)
+
+CHUNK_SIZE = 500_000
+LOG_COLUMNS = (CASE_ID_KEY, ACTIVITY_ID_KEY, TIMESTAMP, LIFECYCLE, EVENT_INSTANCE_KEY)
+
+
+def log_columns(csv_path) -> list:
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return [column for column in header if column in LOG_COLUMNS]
+
+
+def scan_lifecycles(csv_path, chunksize=CHUNK_SIZE):
+    if LIFECYCLE not in log_columns(csv_path):
+        return None
+    values = {}
+    for chunk in pd.read_csv(csv_path, usecols=[LIFECYCLE], chunksize=chunksize):
+        values.update(dict.fromkeys(chunk[LIFECYCLE].dropna().unique()))
+    return list(values)
+
+
+def read_case_chunks(csv_path, chunksize=CHUNK_SIZE):
+    """Yields frames of complete cases read ``chunksize`` rows at a time.
+
+    Events of one case must be contiguous in the file, which is how XES-to-CSV exports lay
+    them out; a case that shows up again after it was yielded raises a ValueError. The rows of
+    the last case in a chunk are held back and prepended to the next.
+    """
+    carry = None
+    closed_cases = set()
+    for chunk in pd.read_csv(csv_path, usecols=log_columns(csv_path), chunksize=chunksize):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        case_ids = chunk[CASE_ID_KEY].dropna().unique()
+        reopened = closed_cases.intersection(case_ids)
+        if reopened:
+            raise ValueError(f'{csv_path} is not grouped by case: {len(reopened)} case(s) reappear after their '
+                             f'events were counted, e.g. {next(iter(reopened))!r}; sort it by case or use the '
+                             f'memory-budgeted (partitioned) mode')
+        open_case = (chunk[CASE_ID_KEY] == chunk[CASE_ID_KEY].iloc[-1]).to_numpy()
+        carry = chunk[open_case]
+        if not open_case.all():
+            closed_cases.update(case_ids)
+            closed_cases.discard(chunk[CASE_ID_KEY].iloc[-1])
+            yield chunk[~open_case]
+    if carry is not None and len(carry):
+        yield carry
+
+
+class StreamingSpeciesCounter:
+    def __init__(self, lifecycles=None, uniform_lambdas=UNIFORM_LAMBDAS, exponential_lambda=EXPONENTIAL_LAMBDA,
+                 respect_lifecycle=True, include_startend=True, k_grams=()):
+        self.lifecycles = lifecycles
+        self.tasks = species_tasks(uniform_lambdas, exponential_lambda, respect_lifecycle, include_startend,
+                                   k_grams)
+        self.counters = {name: {} for name in self.tasks}
+        self.num_cases = 0
+        self.num_events = 0
+
+    def update(self, cases: DataFrame):
+        self.update_log(encode_log(cases, lifecycles=self.lifecycles))
+
+    def update_log(self, log: EncodedLog):
+        # every species count is a sum over cases, so disjoint case batches can be merged by addition
+        with span('species.durations', rows=len(log)):
+            durations = duration_arrays(log)
+        for name, (kind, params) in self.tasks.items():
+            with span(f'species.{name}', rows=len(log)):
+                table = compute_species(log, kind, params, durations)
+            with span('streaming.merge', rows=len(table)):
+                for key, count in zip(species_keys(table), species_counts(table).tolist()):
+                    self.add(name, key, count)
+        self.num_cases += log.num_cases
+        self.num_events += len(log)
+
+    def add(self, name, key, count):
+        counter = self.counters[name]
+        counter[key] = counter.get(key, 0) + count
+
+    def tables(self) -> dict:
+        return {name: species_table(kind, self.counters[name]) for name, (kind, _) in self.tasks.items()}
+
+
+def stream_species(csv_path, chunksize=CHUNK_SIZE, **species_params) -> dict:
+    counter = StreamingSpeciesCounter(scan_lifecycles(csv_path, chunksize), **species_params)
+    for cases in read_case_chunks(csv_path, chunksize):
+        counter.update(cases)
+    return counter.tables()
+
+
+class SpeciesAbundanceIndex(StreamingSpeciesCounter):
+    """Persistent species counters that are kept up to date as a log grows.
+
+    Besides the per-species counts it keeps, for every species kind, the frequency-of-frequencies
+    table ``{k: number of species seen exactly k times}`` so S_obs, Q1 and Q2 are always at hand.
+    Events of cases that are still running are buffered until the case is closed; a closed case
+    is counted once and may not receive further events. Logs with a lifecycle column need the
+    log's ``lifecycles`` up front: they are part of the saved index, and every batch is encoded
+    against them so a batch of only ``complete`` events is classified like the full log.
+    """
+
+    def __init__(self, lifecycles=None, **species_params):
+        super().__init__(lifecycles, **species_params)
+        self.frequencies = {name: {} for name in self.tasks}
+        self.open_events = None
+        self.closed_cases = set()
+
+    def add(self, name, key, count):
+        counter, frequencies = self.counters[name], self.frequencies[name]
+        old = counter.get(key, 0)
+        if old:
+            frequencies[old] -= 1
+            if not frequencies[old]:
+                del frequencies[old]
+        counter[key] = old + count
+        frequencies[old + count] = frequencies.get(old + count, 0) + 1
+
+    def add_cases(self, cases: DataFrame):
+        case_ids = cases[CASE_ID_KEY].dropna().unique()
+        late = self.closed_cases.intersection(case_ids)
+        if late:
+            raise ValueError(f'events arrived for {len(late)} already closed case(s), e.g. {next(iter(late))!r}')
+        self.check_lifecycles(cases)
+        self.update(cases)
+        self.closed_cases.update(case_ids)
+
+    def check_lifecycles(self, cases: DataFrame):
+        if LIFECYCLE not in cases.columns:
+            return
+        if self.lifecycles is None:
+            raise ValueError('the log has lifecycle transitions; create the index with its lifecycles '
+                             '(e.g. scan_lifecycles) so every batch is encoded alike')
+        unknown = set(cases[LIFECYCLE].dropna().unique()).difference(self.lifecycles)
+        if unknown:
+            raise ValueError(f'lifecycle transition(s) {sorted(unknown)} are not in the index lifecycles '
+                             f'{list(self.lifecycles)}')
+
+    def append_events(self, events: DataFrame, closed_cases=()):
+        if self.open_events is not None:
+            events = pd.concat([self.open_events, events], ignore_index=True)
+        self.open_events = events
+        self.close_cases(closed_cases)
+
+    def close_cases(self, case_ids):
+        if self.open_events is None:
+            return
+        closing = self.open_events[CASE_ID_KEY].isin(list(case_ids)).to_numpy()
+        if closing.any():
+            self.add_cases(self.open_events[closing])
+            self.open_events = self.open_events[~closing].reset_index(drop=True)
+
+    def estimator_inputs(self) -> dict:
+        return {name: (len(self.counters[name]), self.frequencies[name].get(1, 0), self.frequencies[name].get(2, 0))
+                for name in self.tasks}
+
+    def export_snapshot(self, output_dir, prefix=''):
+        save_species_tables(self.tables(), output_dir, prefix)
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, path)
+
+    @staticmethod
+    def load(path) -> 'SpeciesAbundanceIndex':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
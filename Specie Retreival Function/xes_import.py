@@ -0,0 +1,205 @@
+import gzip
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+import pandas as pd
+
+from profiling import span
+from species_engine import (ACTIVITY_ID_KEY, EVENT_INSTANCE_KEY, LIFECYCLE, TIMESTAMP, EncodedLog,
+                            sortable_timestamps, to_nanoseconds)
+from streaming_species import StreamingSpeciesCounter
+
+CHUNK_EVENTS = 500_000
+XES_SUFFIXES = ('.xes', '.xes.gz')
+
+# event attributes read from every <event>; the case id is the <trace>'s concept:name
+EVENT_KEYS = (ACTIVITY_ID_KEY, TIMESTAMP, LIFECYCLE, EVENT_INSTANCE_KEY)
+DICTIONARY_KEYS = (ACTIVITY_ID_KEY, LIFECYCLE, EVENT_INSTANCE_KEY)
+
+
+def is_xes(path) -> bool:
+    return str(path).lower().endswith(XES_SUFFIXES)
+
+
+def open_xes(path):
+    """Opens an XES log for binary reading; ``.xes.gz`` logs are decompressed as they are read."""
+    return gzip.open(path, 'rb') if str(path).lower().endswith('.gz') else open(path, 'rb')
+
+
+def local_name(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+class XesDictionaries:
+    """Label -> code dictionaries that grow while a log is read; a code never changes once assigned."""
+
+    def __init__(self, lifecycles=None):
+        self.cases = {}
+        self.labels = {key: {} for key in DICTIONARY_KEYS}
+        for value in lifecycles or ():
+            self.code(self.labels[LIFECYCLE], value)
+
+    @staticmethod
+    def code(dictionary: dict, label) -> int:
+        if label is None:
+            return -1
+        return dictionary.setdefault(label, len(dictionary))
+
+    def values(self, key) -> np.ndarray:
+        dictionary = self.cases if key is None else self.labels[key]
+        return np.array(list(dictionary), dtype=object)
+
+
+def xes_event_batches(path, dictionaries: XesDictionaries, chunk_events=CHUNK_EVENTS):
+    """Yields ``(case_codes, activity_codes, timestamps, lifecycle_codes, instance_codes)`` of whole traces.
+
+    Batches hold at least ``chunk_events`` events, except the last. Codes index ``dictionaries``
+    and are -1 where the attribute is missing; ``lifecycle_codes``/``instance_codes`` are None
+    until the log has shown that attribute. Finished traces are dropped from the element tree, so
+    memory is bounded by one batch plus the dictionaries.
+    """
+    columns = {key: [] for key in EVENT_KEYS}
+    case_codes = []
+    seen = set()
+    stack = []
+    root = event = case_id = None
+    trace_events = 0
+
+    def batch():
+        codes = {key: np.array(columns[key], dtype=np.int64) for key in DICTIONARY_KEYS}
+        timestamps = to_nanoseconds(pd.Series(columns[TIMESTAMP], dtype=object))
+        result = (np.array(case_codes, dtype=np.int64), codes[ACTIVITY_ID_KEY], timestamps,
+                  codes[LIFECYCLE] if LIFECYCLE in seen else None,
+                  codes[EVENT_INSTANCE_KEY] if EVENT_INSTANCE_KEY in seen else None)
+        for values in columns.values():
+            values.clear()
+        case_codes.clear()
+        return result
+
+    with open_xes(path) as f:
+        for kind, element in iterparse(f, events=('start', 'end')):
+            tag = local_name(element.tag)
+            if kind == 'start':
+                if root is None:
+                    root = element
+                stack.append(tag)
+                if tag == 'trace':
+                    case_id, trace_events = None, 0
+                elif tag == 'event':
+                    event = {}
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if tag == 'event' and parent == 'trace':
+                for key in DICTIONARY_KEYS:
+                    columns[key].append(XesDictionaries.code(dictionaries.labels[key], event.get(key)))
+                columns[TIMESTAMP].append(event.get(TIMESTAMP))
+                trace_events += 1
+                event = None
+            elif tag == 'trace':
+                case_codes.extend([XesDictionaries.code(dictionaries.cases, case_id)] * trace_events)
+                root.clear()
+                if len(case_codes) >= chunk_events:
+                    yield batch()
+            elif parent == 'event' and event is not None:
+                key = element.get('key')
+                if key in EVENT_KEYS:
+                    event[key] = element.get('value')
+                    seen.add(key)
+            elif parent == 'trace' and element.get('key') == ACTIVITY_ID_KEY:
+                case_id = element.get('value')
+
+    if case_codes:
+        yield batch()
+
+
+def scan_xes_lifecycles(path):
+    """``scan_lifecycles`` for XES logs: every lifecycle transition in order of first appearance."""
+    values = {}
+    with open_xes(path) as f:
+        for _, element in iterparse(f, events=('end',)):
+            if element.get('key') == LIFECYCLE:
+                values.setdefault(element.get('value'))
+            elif local_name(element.tag) == 'trace':
+                element.clear()
+    return list(values) if values else None
+
+
+def to_encoded_log(case_codes, activity_codes, timestamps, lifecycle_codes, instance_codes,
+                   cases, activities, lifecycles, instances) -> EncodedLog:
+    """Sorts one batch by (case, timestamp) and renumbers its cases from 0, as ``encode_log`` does."""
+    # events without a case or activity never form a species, as in encode_log
+    rows = np.flatnonzero((case_codes >= 0) & (activity_codes >= 0))
+    case_ids, local_cases = np.unique(case_codes[rows], return_inverse=True)
+    order = np.lexsort((sortable_timestamps(timestamps[rows]), local_cases))
+    rows = rows[order]
+    if lifecycle_codes is not None:
+        lifecycle_codes = lifecycle_codes[rows].astype(np.int8)
+        lifecycles = pd.Index(lifecycles)
+    else:
+        lifecycles = None
+    if instance_codes is not None:
+        instance_codes = instance_codes[rows]
+    else:
+        instances = None
+    return EncodedLog(local_cases[order].astype(np.int64), activity_codes[rows].astype(np.int32), timestamps[rows],
+                      cases[case_ids], activities, lifecycle_codes, lifecycles, instance_codes, instances)
+
+
+def iter_xes_chunks(path, chunk_events=CHUNK_EVENTS, lifecycles=None):
+    """Yields the log as EncodedLogs of whole cases, about ``chunk_events`` events each.
+
+    Activity codes index the activity dictionary read so far, so a code means the same activity
+    in every chunk. Pass the log's ``lifecycles`` (``scan_xes_lifecycles``) to have every chunk
+    treat lifecycle information alike.
+    """
+    dictionaries = XesDictionaries(lifecycles)
+    for batch in xes_event_batches(path, dictionaries, chunk_events):
+        yield to_encoded_log(*batch, dictionaries.values(None), dictionaries.values(ACTIVITY_ID_KEY),
+                             list(dictionaries.labels[LIFECYCLE]), dictionaries.values(EVENT_INSTANCE_KEY))
+
+
+def sorted_dictionary(codes, labels):
+    """Recodes ``codes`` against the sorted ``labels``, the dictionary ``pd.factorize(sort=True)`` builds."""
+    order = np.argsort(labels, kind='stable')
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[order] = np.arange(len(labels))
+    return np.where(codes >= 0, rank[np.maximum(codes, 0)] if len(labels) else -1, -1), labels[order]
+
+
+def read_xes(path, chunk_events=CHUNK_EVENTS) -> EncodedLog:
+    """Reads an XES log into the EncodedLog ``encode_log`` builds from the log's CSV export."""
+    dictionaries = XesDictionaries()
+    with span('log.read_xes') as read:
+        batches = list(xes_event_batches(path, dictionaries, chunk_events))
+        read.rows = sum(len(batch[0]) for batch in batches)
+    if not batches:
+        empty = np.zeros(0, dtype=np.int64)
+        batches = [(empty, empty, empty, None, None)]
+
+    def column(i):
+        if all(batch[i] is None for batch in batches):
+            return None
+        # an optional attribute may only show up in later batches
+        return np.concatenate([np.full(len(batch[0]), -1, dtype=np.int64) if batch[i] is None else batch[i]
+                               for batch in batches])
+
+    case_codes, activity_codes, timestamps, lifecycle_codes, instance_codes = map(column, range(5))
+    del batches
+    case_codes, cases = sorted_dictionary(case_codes, dictionaries.values(None))
+    activity_codes, activities = sorted_dictionary(activity_codes, dictionaries.values(ACTIVITY_ID_KEY))
+    instances = None
+    if instance_codes is not None:
+        instance_codes, instances = sorted_dictionary(instance_codes, dictionaries.values(EVENT_INSTANCE_KEY))
+    return to_encoded_log(case_codes, activity_codes, timestamps, lifecycle_codes, instance_codes, cases,
+                          activities, list(dictionaries.labels[LIFECYCLE]), instances)
+
+
+def stream_xes_species(path, chunk_events=CHUNK_EVENTS, **species_params) -> dict:
+    """``stream_species`` for XES logs."""
+    lifecycles = scan_xes_lifecycles(path)
+    counter = StreamingSpeciesCounter(lifecycles, **species_params)
+    for log in iter_xes_chunks(path, chunk_events, lifecycles):
+        counter.update_log(log)
+    return counter.tables()